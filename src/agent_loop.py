@@ -0,0 +1,94 @@
+"""
+Long-lived asyncio event loop for agent calls in The People Person
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+
+async def _await(awaitable):
+    """Wrap any awaitable (task, future) in a coroutine so it can be submitted to the loop."""
+    return await awaitable
+
+
+class AgentLoop:
+    """A single event loop running on a dedicated daemon thread.
+
+    All agent calls go through this loop, so the OpenAI client and its HTTP
+    connections are created once and reused for the whole session instead of
+    being torn down by a fresh `asyncio.run` on every call.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running event loop, started on first use."""
+        self.start()
+        return self._loop
+
+    def start(self):
+        """Start the loop thread (idempotent)."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+
+            def _run_loop():
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=_run_loop, name="AgentLoop", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def submit(self, awaitable) -> concurrent.futures.Future:
+        """Schedule a coroutine or awaitable on the loop and return a thread-safe future."""
+        if not asyncio.iscoroutine(awaitable):
+            awaitable = _await(awaitable)
+        return asyncio.run_coroutine_threadsafe(awaitable, self.loop)
+
+    def spawn(self, awaitable):
+        """Schedule an awaitable on the event loop of the calling thread if it has one
+        (e.g. in headless runs), otherwise on the agent loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self.submit(awaitable)
+        return asyncio.ensure_future(awaitable)
+
+    def run(self, awaitable, timeout=None):
+        """Run an awaitable on the loop and block the calling thread until it finishes."""
+        return self.submit(awaitable).result(timeout)
+
+    def call_soon(self, callback, *args):
+        """Thread-safe `call_soon` on the loop."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 2.0):
+        """Cancel outstanding tasks and stop the loop thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def _shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+        except (concurrent.futures.TimeoutError, RuntimeError):
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
@@ -0,0 +1,225 @@
+"""
+Pluggable LLM backends for agent calls in The People Person
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import perf
+
+logger = logging.getLogger(__name__)
+
+# The Agents SDK, once imported (see load_sdk)
+_sdk = None
+_sdk_lock = threading.Lock()
+
+
+def load_sdk() -> SimpleNamespace:
+    """Import the OpenAI Agents SDK on first use and return the parts the game uses.
+
+    The import takes seconds, so nothing imports the SDK at module load: the game
+    starts this in the background while the player is still on the API key screen.
+    """
+    global _sdk
+    with _sdk_lock:
+        if _sdk is None:
+            start = time.perf_counter()
+            import agents
+            from openai import AsyncOpenAI
+            from openai.types.responses import ResponseTextDeltaEvent
+            _sdk = SimpleNamespace(
+                Agent=agents.Agent, Runner=agents.Runner,
+                set_default_openai_client=agents.set_default_openai_client,
+                AsyncOpenAI=AsyncOpenAI, ResponseTextDeltaEvent=ResponseTextDeltaEvent,
+            )
+            elapsed = time.perf_counter() - start
+            perf.RECORDER.record('import.agents', elapsed)
+            logger.info("Imported the Agents SDK in %.0f ms", elapsed * 1000)
+        return _sdk
+
+
+class Backend:
+    """Something that answers single-turn agent calls.
+
+    `run` returns the agent's stripped text output. If `on_delta` is given the
+    backend should stream and call `on_delta(partial_text)` as text arrives.
+    """
+
+    async def run(self, name, instructions, prompt, model, on_delta=None) -> str:
+        raise NotImplementedError
+
+    async def warm_up(self):
+        """Get ready for the first call (load clients, open connections); optional."""
+
+
+class AgentsBackend(Backend):
+    """Live backend built on the OpenAI Agents SDK (imported on first use)."""
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._client = None
+
+    def _load(self) -> SimpleNamespace:
+        sdk = load_sdk()
+        if self._client is None and self.api_key:
+            # One client (and connection pool) for the whole session, reused across calls
+            self._client = sdk.AsyncOpenAI(api_key=self.api_key)
+            sdk.set_default_openai_client(self._client)
+        return sdk
+
+    async def warm_up(self):
+        """Import the SDK off the event loop, then open the API connection with a free request."""
+        await asyncio.get_running_loop().run_in_executor(None, self._load)
+        if self._client is not None:
+            try:
+                await self._client.models.list()
+            except Exception as exc:
+                logger.info("Backend warm-up request failed: %r", exc)
+
+    async def run(self, name, instructions, prompt, model, on_delta=None) -> str:
+        sdk = self._load()
+        agent = sdk.Agent(name=name, instructions=instructions, model=model)
+        if on_delta is None:
+            result = await sdk.Runner.run(agent, prompt)
+            return result.final_output.strip()
+        result = sdk.Runner.run_streamed(agent, prompt)
+        partial = ''
+        try:
+            async for event in result.stream_events():
+                if event.type == "raw_response_event" and isinstance(event.data, sdk.ResponseTextDeltaEvent):
+                    partial += event.data.delta
+                    on_delta(partial.lstrip())
+        except asyncio.CancelledError:
+            result.cancel()
+            raise
+        return str(result.final_output or partial).strip()
+
+
+# Canned material for the stub backend
+_PERSONALITIES = [
+    "Maya, 34, a nurse who has worked double shifts for months. She feels invisible at home "
+    "and at work, recently split from her partner and has stopped sleeping.",
+    "Tom, 58, a factory foreman laid off after 30 years. He is ashamed to tell his family, "
+    "drinks more than he used to and says he is a burden.",
+    "Priya, 19, a first-year student far from home who failed two exams. She feels like a "
+    "fraud, is isolating in her room and has been crying every night.",
+    "Luis, 42, a father going through a custody dispute. He is angry, exhausted and feels "
+    "like he has lost everything that mattered.",
+]
+_OPENINGS = [
+    "Hi... I don't really know why I called. I just can't keep going like this.",
+    "Hello? Is this the hotline? I feel so alone and I don't know who else to talk to.",
+    "I've been sitting here for an hour trying to decide whether to call. Everything feels pointless.",
+]
+_REPLIES = [
+    "I guess. It's just that nobody really listens to me.",
+    "Maybe you're right. Talking about it helps a little, I think.",
+    "I don't know. I'm so tired of feeling like this.",
+    "Thank you for saying that. I hadn't thought about it that way.",
+    "It's hard. I feel like such a burden to everyone around me.",
+    "I could try calling my sister tomorrow, maybe.",
+]
+_COUNSELOR_LINES = [
+    "I'm really glad you called. Can you tell me a bit about what's been going on?",
+    "That sounds incredibly hard. How long have you been feeling this way?",
+    "You don't have to go through this alone. Is there someone you trust you could reach out to?",
+    "It makes sense that you're exhausted. What has helped you get through tough days before?",
+    "Thank you for sharing that with me. Are you safe right now?",
+]
+_SCORES = [2, 3, 4, 4, 5, 5, 6, 6, 7, 8]
+
+
+class StubRateLimitError(Exception):
+    """The stub backend's stand-in for a provider 429 Too Many Requests."""
+    status_code = 429
+
+    def __init__(self, message, retry_after: float):
+        super().__init__(message)
+        self.response = SimpleNamespace(headers={'retry-after': f"{retry_after:.3f}"})
+
+
+class StubBackend(Backend):
+    """Deterministic local backend for benchmarks and tests: no network, no API key.
+
+    Responses and delays are derived from a hash of (seed, agent name, instructions,
+    input, how many times that exact request has been seen), so identical requests
+    such as the fixed personality prompt still get varied answers while a run with the
+    same sequence of requests is fully reproducible. Each call sleeps for
+    `latency` seconds plus up to `jitter` seconds either way; streamed calls deliver
+    the first word after that delay and the rest at `token_delay` per word. To exercise
+    tail latency and failure handling, a `tail_rate` fraction of calls take
+    `tail_latency` seconds instead, and an `error_rate` fraction fail with
+    ConnectionError after their delay. With `rpm_limit` set, calls beyond that many
+    in any 60 seconds are rejected at once with StubRateLimitError (a 429).
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.1, token_delay: float = 0.0,
+                 seed: int = 0, tail_rate: float = 0.0, tail_latency: float = 5.0,
+                 error_rate: float = 0.0, rpm_limit: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.seed = seed
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.rpm_limit = rpm_limit
+        self._seen: dict[bytes, int] = {}
+        self._recent: deque = deque()
+
+    def _rng(self, name, instructions, prompt) -> random.Random:
+        key = hashlib.sha256(f"{name}\0{instructions}\0{prompt}".encode('utf-8')).digest()
+        occurrence = self._seen.get(key, 0)
+        self._seen[key] = occurrence + 1
+        digest = hashlib.sha256(key + f"\0{self.seed}\0{occurrence}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def respond(self, name, instructions, prompt, rng=None) -> str:
+        """The canned response for a call (without any delay)."""
+        rng = rng or self._rng(name, instructions, prompt)
+        if name == "PersonalityGenerator":
+            return rng.choice(_PERSONALITIES)
+        if name == "InitialCaller":
+            return rng.choice(_OPENINGS)
+        if name == "CallerAgent":
+            return rng.choice(_REPLIES)
+        if name == "MentalHealthAssessor":
+            return str(rng.choice(_SCORES))
+        if name == "ConversationSummarizer":
+            return prompt[-400:].replace('\n', ' ')
+        if name == "CounselorAgent":
+            return rng.choice(_COUNSELOR_LINES)
+        return "Okay."
+
+    def _check_rate(self):
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.rpm_limit:
+            raise StubRateLimitError("stub backend: rate limit reached", 60 - (now - self._recent[0]))
+        self._recent.append(now)
+
+    async def run(self, name, instructions, prompt, model, on_delta=None) -> str:
+        if self.rpm_limit:
+            self._check_rate()
+        rng = self._rng(name, instructions, prompt)
+        text = self.respond(name, instructions, prompt, rng)
+        delay = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        if rng.random() < self.tail_rate:
+            delay = self.tail_latency
+        fail = rng.random() < self.error_rate
+        await asyncio.sleep(delay)
+        if fail:
+            raise ConnectionError(f"stub backend: simulated failure of {name}")
+        if on_delta is not None:
+            words = text.split(' ')
+            for i in range(1, len(words) + 1):
+                on_delta(' '.join(words[:i]))
+                if self.token_delay and i < len(words):
+                    await asyncio.sleep(self.token_delay)
+        return text
@@ -0,0 +1,320 @@
+"""
+Batch evaluation of the mental health scoring over saved transcripts.
+
+Streams transcripts from JSONL files, scores every conversation window the game
+would score (each caller message with up to two turns before it) with bounded
+concurrency, and reports the score distribution, the call outcomes the
+call-end thresholds would give, and throughput.
+
+    python src/batch_eval.py transcripts.jsonl --backend stub --parallel 32
+
+Each input line is a transcript: {"id": "...", "turns": [["Caller", "..."],
+["You", "..."], ...]} (turns may also be {"speaker": ..., "text": ...} objects;
+the id defaults to file:line). Results are appended to the --out file as they
+complete, so an interrupted run picks up where it stopped when started again.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter, defaultdict
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from backends import AgentsBackend, StubBackend
+from cache import ResponseCache
+from game import AGENT_PRIORITIES, LOST_AT, SAVED_AT, call_outcome
+from headless import HeadlessGame
+from resilience import CallExecutor
+from perf import percentile
+from prescore import LocalScorer
+from ratelimit import RateLimiter, default_limits
+from scheduler import FairScheduler
+import perf
+
+# Windows scored per vectorized batch by the local backend
+LOCAL_BATCH = 512
+
+
+class AssessorOnlyScorer(LocalScorer):
+    """A pre-scorer that is never confident, so every window goes to the LLM assessor
+    (its scores are still used as the fallback when the assessor misses its deadline)."""
+
+    def score_batch(self, windows):
+        scores, confidence = super().score_batch(windows)
+        return scores, confidence * 0.0
+
+
+class EvalGame(HeadlessGame):
+    """A game whose scores are the assessor's own answers.
+
+    Agent calls run on the route's first model with no deadline, so a slow call is
+    waited for (or fails and is retried on the next run) instead of being answered by
+    the clamped local stand-in, which is no use for calibrating the thresholds.
+    """
+
+    async def run_agent(self, name, instructions, prompt, model=None, on_delta=None, fallback=None):
+        if model is None:
+            model = self.router.route_for(name).tiers[0][0]
+        return await super().run_agent(name, instructions, prompt, model, on_delta)
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def read_transcripts(paths):
+    """Yield (transcript id, [(speaker, text), ...]) from JSONL files, one line at a time."""
+    for path in paths:
+        with _open(path) as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                turns = [
+                    (turn['speaker'], turn['text']) if isinstance(turn, dict) else tuple(turn)
+                    for turn in record['turns']
+                ]
+                yield str(record.get('id', f"{os.path.basename(path)}:{line_no}")), turns
+
+
+def windows(transcripts, done=frozenset()):
+    """Yield (id, turn index, window) for every caller turn not in `done`.
+
+    The window is what the game scores after that message: it and the two turns before it.
+    """
+    for transcript_id, turns in transcripts:
+        for index, (speaker, _) in enumerate(turns):
+            if speaker == "Caller" and (transcript_id, index) not in done:
+                yield transcript_id, index, turns[max(0, index - 2):index + 1]
+
+
+def load_checkpoint(path):
+    """(id, turn) of every window already scored in a results file.
+
+    Windows that failed, and a line cut short by an interruption, are scored again.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if 'score' in result:
+                done.add((result['id'], result['turn']))
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per scored window and flushes it (the checkpoint)."""
+
+    def __init__(self, path, restart=False):
+        # A line cut short by an interruption must not swallow the next result
+        if not restart and os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                partial = f.read(1) != b'\n'
+        else:
+            partial = False
+        self._file = open(path, 'w' if restart else 'a', encoding='utf-8')
+        if partial:
+            self._file.write('\n')
+        self.written = 0
+        self.errors = 0
+
+    def write(self, transcript_id, turn, score=None, seconds=None, error=None):
+        result = {'id': transcript_id, 'turn': turn}
+        if error is None:
+            result['score'] = score
+            if seconds is not None:
+                result['ms'] = round(seconds * 1000, 1)
+            self.written += 1
+        else:
+            result['error'] = error
+            self.errors += 1
+        self._file.write(json.dumps(result) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+async def score_with_agents(game: EvalGame, pending, writer: ResultWriter, parallel: int):
+    """Score windows with `game.score_mental_health`, at most `parallel` at a time.
+
+    Windows are pulled from the `pending` iterator only as workers free up, so a
+    corpus of any size is streamed rather than loaded.
+    """
+    latencies = []
+
+    async def worker():
+        for transcript_id, turn, window in pending:
+            start = time.perf_counter()
+            try:
+                score = await game.score_mental_health(window)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                writer.write(transcript_id, turn, error=repr(exc))
+                continue
+            seconds = time.perf_counter() - start
+            latencies.append(seconds)
+            writer.write(transcript_id, turn, score, seconds)
+
+    await asyncio.gather(*(worker() for _ in range(parallel)))
+    return latencies
+
+
+def score_locally(pending, writer: ResultWriter, batch_size: int = LOCAL_BATCH):
+    """Score windows with the local pre-scorer alone, a vectorized batch at a time."""
+    scorer = LocalScorer()
+    batch = []
+    for item in pending:
+        batch.append(item)
+        if len(batch) == batch_size:
+            _write_local(scorer, batch, writer)
+            batch = []
+    if batch:
+        _write_local(scorer, batch, writer)
+
+
+def _write_local(scorer, batch, writer):
+    scores, _ = scorer.score_batch([window for _, _, window in batch])
+    for (transcript_id, turn, _), score in zip(batch, scores):
+        writer.write(transcript_id, turn, int(score))
+
+
+def summarize(path, lost_at: int = LOST_AT, saved_at: int = SAVED_AT) -> dict:
+    """Score distribution and call outcomes over every result in a results file.
+
+    A transcript's outcome is decided by its first window at or beyond a threshold,
+    as the game ends a call there; transcripts that never cross one stay open.
+    """
+    by_transcript = defaultdict(dict)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if 'score' in result:
+                by_transcript[result['id']][result['turn']] = result['score']
+    distribution = Counter()
+    outcomes = Counter()
+    turns_to_end = []
+    for scores in by_transcript.values():
+        distribution.update(scores.values())
+        outcome = 'open'
+        for position, turn in enumerate(sorted(scores), start=1):
+            ended = call_outcome(scores[turn], lost_at, saved_at)
+            if ended is not None:
+                outcome = ended
+                turns_to_end.append(position)
+                break
+        outcomes[outcome] += 1
+    total = sum(distribution.values())
+    return {
+        'windows': total,
+        'transcripts': len(by_transcript),
+        'distribution': {score: distribution[score] for score in range(1, 11)},
+        'mean': round(sum(s * n for s, n in distribution.items()) / total, 2) if total else 0.0,
+        'at_or_below_lost': round(sum(n for s, n in distribution.items() if s <= lost_at) / total, 3) if total else 0.0,
+        'at_or_above_saved': round(sum(n for s, n in distribution.items() if s >= saved_at) / total, 3) if total else 0.0,
+        'outcomes': {key: outcomes[key] for key in ('saved', 'lost', 'open')},
+        'windows_to_end_p50': percentile(turns_to_end, 50),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch evaluation of mental health scoring over transcripts")
+    parser.add_argument('inputs', nargs='+', metavar='TRANSCRIPTS', help="JSONL transcript files (.gz ok)")
+    parser.add_argument('--out', metavar='PATH',
+                        help="results/checkpoint file (default: <first input>.scores.jsonl)")
+    parser.add_argument('--restart', action='store_true', help="discard earlier results instead of resuming")
+    parser.add_argument('--backend', choices=['openai', 'stub', 'local'], default='stub',
+                        help="LLM assessor, deterministic stub assessor, or the local pre-scorer alone")
+    parser.add_argument('--assessor-only', action='store_true',
+                        help="send every window to the assessor instead of pre-scoring clear-cut ones locally")
+    parser.add_argument('--parallel', type=int, default=16, help="windows scored concurrently")
+    parser.add_argument('--rpm', type=float, help="requests/min limit (default: the game's for openai, none for stub)")
+    parser.add_argument('--tpm', type=float, help="tokens/min limit (default: the game's for openai, none for stub)")
+    parser.add_argument('--latency', type=float, default=0.5, help="stub latency per call (s)")
+    parser.add_argument('--jitter', type=float, default=0.1, help="stub latency jitter (s)")
+    parser.add_argument('--seed', type=int, default=0, help="stub random seed")
+    parser.add_argument('--lost-at', type=int, default=LOST_AT, help="call-end threshold for a lost caller")
+    parser.add_argument('--saved-at', type=int, default=SAVED_AT, help="call-end threshold for a saved caller")
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY'))
+    args = parser.parse_args(argv)
+    if args.parallel < 1:
+        parser.error("--parallel must be at least 1")
+    if args.backend == 'openai' and not args.api_key:
+        parser.error("--backend openai needs --api-key or OPENAI_API_KEY")
+    out = args.out or f"{args.inputs[0]}.scores.jsonl"
+
+    done = frozenset() if args.restart else load_checkpoint(out)
+    pending = windows(read_transcripts(args.inputs), done)
+    writer = ResultWriter(out, restart=args.restart)
+    report = {'resumed': len(done)}
+    latencies = []
+    game = None
+    start = time.perf_counter()
+    try:
+        if args.backend == 'local':
+            score_locally(pending, writer)
+        else:
+            if args.backend == 'stub':
+                backend = StubBackend(latency=args.latency, jitter=args.jitter, seed=args.seed)
+            else:
+                backend = AgentsBackend(args.api_key)
+            rpm, tpm = default_limits(args.backend, args.rpm, args.tpm)
+            scheduler = FairScheduler(
+                args.parallel, RateLimiter(rpm, tpm) if rpm or tpm else None,
+                priorities=AGENT_PRIORITIES, recorder=perf.RECORDER,
+            )
+            # Never hedge: a batch run wants throughput, and a hedge doubles the cost of a window
+            executor = CallExecutor(perf.RECORDER, hedge_min_samples=sys.maxsize)
+            # Every window is scored afresh: a cache hit would skew latency and throughput
+            response_cache = ResponseCache(bypass={"MentalHealthAssessor"})
+            game = EvalGame("", None, backend=backend, scheduler=scheduler, executor=executor,
+                            response_cache=response_cache)
+            if args.assessor_only:
+                game.local_scorer = AssessorOnlyScorer()
+            latencies = asyncio.run(score_with_agents(game, pending, writer, args.parallel))
+    except KeyboardInterrupt:
+        report['interrupted'] = True
+    finally:
+        writer.close()
+        if game is not None:
+            game.agent_loop.stop()
+    elapsed = time.perf_counter() - start
+
+    report.update({
+        'scored': writer.written,
+        'errors': writer.errors,
+        'elapsed_s': round(elapsed, 3),
+        'windows_per_second': round(writer.written / elapsed, 1) if elapsed else 0.0,
+    })
+    if latencies:
+        report['latency_ms'] = {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+        }
+    if game is not None:
+        report['local_prescorer'] = str(game.scoring_stats)
+        report['resilience'] = game.executor.stats()
+        report['scheduler'] = scheduler.stats()
+    report['results'] = summarize(out, args.lost_at, args.saved_at)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Response cache for agent calls in The People Person
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Memoize agent responses keyed by (agent name, model, instructions, input).
+
+    Entries live in an in-memory LRU and, if `path` is given, in an SQLite store that
+    survives restarts; disk entries expire after `ttl` seconds and the store is capped
+    at `max_disk_entries` (oldest entries are dropped first). Agents listed in `bypass`
+    are never cached, for calls where variety matters more than speed.
+    """
+
+    def __init__(self, max_entries: int = 512, path=None, ttl: float = 7 * 24 * 3600,
+                 max_disk_entries: int = 10000, bypass=()):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.bypass = set(bypass)
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, agent TEXT, value TEXT, created REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(name, model, instructions, prompt) -> str:
+        """Stable digest of everything that determines an agent's response."""
+        raw = json.dumps([name, str(model), instructions, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def enabled_for(self, name) -> bool:
+        """Whether responses of the named agent are cached."""
+        return name not in self.bypass
+
+    def get(self, name, model, instructions, prompt):
+        """Return the cached response, or None on a miss."""
+        key = self.make_key(name, model, instructions, prompt)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM responses WHERE key = ? AND created >= ?",
+                    (key, time.time() - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    value = row[0]
+                    self._remember(key, value)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, name, model, instructions, prompt, value: str):
+        """Store a response in memory and, if configured, on disk."""
+        key = self.make_key(name, model, instructions, prompt)
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, agent, value, created) VALUES (?, ?, ?, ?)",
+                    (key, name, value, now)
+                )
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                    "ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the current in-memory size."""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._memory),
+        }
+
+    def close(self):
+        """Close the on-disk store."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
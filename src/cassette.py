@@ -0,0 +1,169 @@
+"""
+Record/replay cassettes for deterministic offline sessions of The People Person
+"""
+import asyncio
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from backends import Backend
+from cache import ResponseCache
+
+CASSETTE_VERSION = 1
+# Characters of each request kept in the journal to make mismatch reports readable
+EXCERPT_CHARS = 80
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMismatch(Exception):
+    """A replayed session made an agent request the cassette has no answer for."""
+
+
+class CassetteRecorder(Backend):
+    """Backend wrapper that journals every agent request/response and player input.
+
+    The journal is gzip-compressed JSONL: a header line, then one entry per agent call
+    (request digest, agent, short excerpt, response, latency) or player input, each
+    stamped with its offset in seconds from the start of the session. A player name
+    given after recording has started is journaled as a 'player' entry, and the start
+    of play (after the setup screens) as a 'start' entry. Every entry
+    is flushed as it is written, so the journal of a session that crashed or was
+    killed can still be replayed up to that point.
+    """
+
+    def __init__(self, inner: Backend, path, player_name=None):
+        self.inner = inner
+        self.path = path
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'kind': 'header', 'version': CASSETTE_VERSION,
+                     'started': time.time(), 'player': player_name})
+
+    def _write(self, entry):
+        with self._lock:
+            if self._file is not None:
+                self._file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+                # Sync-flushes the compressor: everything up to here is readable without close()
+                self._file.flush()
+
+    def _offset(self) -> float:
+        return round(time.monotonic() - self._start, 4)
+
+    async def run(self, name, instructions, prompt, model, on_delta=None) -> str:
+        started = time.monotonic()
+        text = await self.inner.run(name, instructions, prompt, model, on_delta)
+        self._write({
+            'kind': 'agent',
+            't': self._offset(),
+            'agent': name,
+            'key': ResponseCache.make_key(name, model, instructions, prompt),
+            'excerpt': prompt[-EXCERPT_CHARS:],
+            'response': text,
+            'latency': round(time.monotonic() - started, 4),
+        })
+        return text
+
+    async def warm_up(self):
+        await self.inner.warm_up()
+
+    def note_player(self, player_name):
+        """Journal the player's name (once they have entered it)."""
+        self._write({'kind': 'player', 't': self._offset(), 'name': player_name})
+
+    def mark_start(self):
+        """Journal the moment play starts; player inputs are replayed relative to it."""
+        self._write({'kind': 'start', 't': self._offset()})
+
+    def note_input(self, text):
+        """Journal a message the player sent."""
+        self._write({'kind': 'input', 't': self._offset(), 'text': text})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CassetteBackend(Backend):
+    """Offline backend that serves the responses of a recorded session.
+
+    Requests are matched by digest, so prefetch and background calls may interleave
+    differently than when recording. A request that is not on the cassette is recorded
+    as a mismatch and answered with the next unused response of the same agent; if
+    there is none, CassetteMismatch is raised. With `pacing='recorded'` each response
+    is delayed by its recorded latency, otherwise responses are served immediately.
+    `inputs` holds the player's messages with their offsets from the start of play.
+    """
+
+    def __init__(self, path, pacing: str = 'fast'):
+        self.path = path
+        self.pacing = pacing
+        self.header = {}
+        self.inputs: list[tuple[float, str]] = []
+        self.mismatches: list[dict] = []
+        self.served = 0
+        self._by_key: dict[str, deque] = defaultdict(deque)
+        self._by_agent: dict[str, deque] = defaultdict(deque)
+        # Time spent on the setup screens before play started (0 for older cassettes)
+        started = 0.0
+        for entry in self._entries(path):
+            kind = entry.get('kind')
+            if kind == 'header':
+                self.header = entry
+            elif kind == 'player':
+                self.header['player'] = entry['name']
+            elif kind == 'start':
+                started = entry['t']
+            elif kind == 'input':
+                self.inputs.append((max(0.0, round(entry['t'] - started, 4)), entry['text']))
+            elif kind == 'agent':
+                # Entries are shared between both indexes; 'used' marks consumption
+                entry['used'] = False
+                self._by_key[entry['key']].append(entry)
+                self._by_agent[entry['agent']].append(entry)
+
+    @staticmethod
+    def _entries(path):
+        """Journal entries in order, up to a tail cut short by a crash or a kill."""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, ValueError) as exc:
+                logger.warning("Cassette %s is truncated (%s); replaying the entries before it", path, exc)
+
+    @staticmethod
+    def _take(entries: deque):
+        while entries and entries[0]['used']:
+            entries.popleft()
+        if not entries:
+            return None
+        entry = entries.popleft()
+        entry['used'] = True
+        return entry
+
+    async def run(self, name, instructions, prompt, model, on_delta=None) -> str:
+        entry = self._take(self._by_key.get(ResponseCache.make_key(name, model, instructions, prompt), deque()))
+        if entry is None:
+            self.mismatches.append({'agent': name, 'excerpt': prompt[-EXCERPT_CHARS:]})
+            logger.warning("Cassette mismatch for %s request ending %r", name, prompt[-EXCERPT_CHARS:])
+            entry = self._take(self._by_agent.get(name, deque()))
+            if entry is None:
+                raise CassetteMismatch(f"no recorded response left for {name}")
+        if self.pacing == 'recorded':
+            await asyncio.sleep(entry['latency'])
+        self.served += 1
+        if on_delta is not None:
+            on_delta(entry['response'])
+        return entry['response']
+
+    def report(self) -> dict:
+        """How the replay went: responses served, mismatches and unused responses."""
+        unused = sum(1 for entries in self._by_agent.values() for e in entries if not e['used'])
+        return {'served': self.served, 'mismatches': len(self.mismatches), 'unused': unused}
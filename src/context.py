@@ -0,0 +1,131 @@
+"""
+Bounded conversation context for the caller agent in The People Person
+"""
+import threading
+from collections import deque
+
+# Default prompt budget for the conversation history sent to the caller agent
+DEFAULT_TOKEN_BUDGET = 1500
+# Always keep at least this many of the latest turns verbatim
+MIN_RECENT_TURNS = 2
+# Longest excerpt of a folded turn used while its summary is still being written
+EXCERPT_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class ConversationContext:
+    """Conversation turns for the caller agent, kept within a token budget.
+
+    Behaves like the plain `chat_history` list of (speaker, message) tuples it replaces,
+    but also maintains the prompt text incrementally: recent turns are kept verbatim
+    and older turns are folded into a rolling summary once the budget is exceeded.
+    The summary is refreshed in the background by `summarize(previous_summary, text)`,
+    a coroutine function scheduled with `submit` (e.g. `AgentLoop.submit`). Until it
+    lands, folded turns are represented by short excerpts so the budget still holds.
+    """
+
+    def __init__(self, turns=(), budget_tokens: int = DEFAULT_TOKEN_BUDGET,
+                 summarize=None, submit=None, labels=None):
+        self.budget_tokens = budget_tokens
+        self.summary = ''
+        self.turns: list[tuple[str, str]] = []
+        self._summarize = summarize
+        self._submit = submit
+        self._labels = labels or {}
+        self._recent: deque = deque()  # (line, tokens) for turns kept verbatim
+        self._recent_tokens = 0
+        self._folded: list[str] = []  # lines folded out but not yet in the summary
+        self._refreshing = None
+        self._lock = threading.Lock()
+        for turn in turns:
+            self.append(turn)
+
+    # Sequence interface, so existing chat_history users keep working
+    def __len__(self):
+        return len(self.turns)
+
+    def __getitem__(self, index):
+        return self.turns[index]
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    def append(self, turn):
+        """Add a (speaker, message) turn, folding the oldest turns out if over budget."""
+        speaker, msg = turn
+        line = f"{self._labels.get(speaker, speaker)}: {msg}\n"
+        with self._lock:
+            self.turns.append((speaker, msg))
+            tokens = estimate_tokens(line)
+            self._recent.append((line, tokens))
+            self._recent_tokens += tokens
+            while (self._recent_tokens + estimate_tokens(self.summary) > self.budget_tokens
+                   and len(self._recent) > MIN_RECENT_TURNS):
+                old_line, old_tokens = self._recent.popleft()
+                self._recent_tokens -= old_tokens
+                self._folded.append(old_line)
+            needs_refresh = bool(self._folded) and self._refreshing is None
+        if needs_refresh:
+            self._schedule_refresh()
+
+    def prompt_text(self) -> str:
+        """Conversation text for the prompt: rolling summary, pending excerpts, recent turns."""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of the earlier conversation: {self.summary}\n")
+            if self._folded:
+                parts.append(self._folded_excerpt())
+            parts.extend(line for line, _ in self._recent)
+        return "".join(parts)
+
+    def token_count(self) -> int:
+        """Estimated size of `prompt_text()` in tokens."""
+        return estimate_tokens(self.prompt_text())
+
+    def _folded_excerpt(self) -> str:
+        # Newest folded turns first until the leftover budget is used up
+        room = max(0, self.budget_tokens - self._recent_tokens - estimate_tokens(self.summary)) * 4
+        excerpt: list[str] = []
+        for line in reversed(self._folded):
+            line = line.rstrip('\n')
+            if len(line) > EXCERPT_CHARS:
+                line = line[:EXCERPT_CHARS - 3].rstrip() + '...'
+            if len(line) + 1 > room:
+                break
+            excerpt.append(line + '\n')
+            room -= len(line) + 1
+        if not excerpt:
+            return ''
+        return "Earlier (abridged):\n" + "".join(reversed(excerpt))
+
+    def _schedule_refresh(self):
+        if self._summarize is None or self._submit is None:
+            return
+        with self._lock:
+            if self._refreshing is not None:
+                return
+            self._refreshing = self._submit(self._refresh())
+
+    async def _refresh(self):
+        try:
+            while True:
+                with self._lock:
+                    pending = list(self._folded)
+                    previous = self.summary
+                if not pending:
+                    return
+                summary = await self._summarize(previous, "".join(pending))
+                with self._lock:
+                    self.summary = summary.strip()
+                    del self._folded[:len(pending)]
+        except Exception:
+            # Keep the excerpts; the next fold will try again
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = None
@@ -3,64 +3,129 @@ Game logic for The People Person
 """
 import os
 import sys
-import json
-import openai
+import logging
 import pygame
 import asyncio
-from agents import Agent, Runner
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError
+
+from agent_loop import AgentLoop
+from backends import AgentsBackend
+from cache import ResponseCache
+from context import ConversationContext, estimate_tokens
+from high_scores import HighScoreStore
+import perf
+from prescore import LocalScorer, ScoringStats
+from prefetch import CallerPrefetcher, PrefetchedCaller
+from renderer import DirtyRegions, wait_events
+from resilience import CallExecutor, RetryPolicy
+from ratelimit import RateLimiter
+from routing import ModelRouter, Route
+from scheduler import BACKGROUND, INTERACTIVE, PRIORITY, SCORING, FairScheduler
+from text_layout import IncrementalWrapper, LayoutCache
 
 # Default LLM model
 DEFAULT_MODEL = "gpt-4o"
+# Fast, cheap model for the integer-only assessor and for fallbacks
+FAST_MODEL = "gpt-4o-mini"
+# Per-agent routing: (model, deadline in seconds) tiers tried in order, then an
+# optional local default. For streamed replies the deadline is time to first token.
+AGENT_ROUTES = {
+    "PersonalityGenerator": Route(
+        ((DEFAULT_MODEL, 15.0), (FAST_MODEL, 10.0)),
+        default="A person in their thirties who recently lost their job and feels "
+                "isolated, ashamed and unsure who to turn to.",
+    ),
+    "InitialCaller": Route(
+        ((DEFAULT_MODEL, 10.0), (FAST_MODEL, 8.0)),
+        default="Hello? I... I don't really know why I called. I just needed to talk to someone.",
+    ),
+    "CallerAgent": Route(
+        ((DEFAULT_MODEL, 8.0), (FAST_MODEL, 6.0)),
+        default="Sorry... I lost my train of thought. Can you say that again?",
+    ),
+    # The assessor falls back to the local pre-scorer (see score_mental_health)
+    "MentalHealthAssessor": Route(((FAST_MODEL, 4.0),)),
+    "ConversationSummarizer": Route(((FAST_MODEL, 20.0),)),
+}
+# Latency-critical agents on the turn path: a duplicate request is sent when a call
+# runs past the observed p90 and the first answer wins
+HEDGED_AGENTS = {"CallerAgent", "MentalHealthAssessor"}
+# Scheduling class of each agent: replies the player is waiting on go first, then
+# scoring, then speculative/background generation (unlisted agents are background)
+AGENT_PRIORITIES = {
+    "CallerAgent": INTERACTIVE,
+    "CounselorAgent": INTERACTIVE,
+    "MentalHealthAssessor": SCORING,
+    "PersonalityGenerator": BACKGROUND,
+    "InitialCaller": BACKGROUND,
+    "ConversationSummarizer": BACKGROUND,
+}
+# Agent calls in flight at once
+AGENT_CONCURRENCY = 8
+# Provider limits for the API key (requests and tokens per minute); raise for higher usage tiers
+RATE_LIMIT_RPM = 500
+RATE_LIMIT_TPM = 30000
+# Number of ready callers kept in the background prefetch queue
+PREFETCH_SIZE = 2
+# Stream caller replies into the chat area token by token
+STREAM_REPLIES = True
+# Token budget for the conversation history sent to the caller agent
+CONTEXT_TOKEN_BUDGET = 1500
+# Call-end thresholds: a caller scored at or below LOST_AT is lost (-1 point), at or
+# above SAVED_AT saved (+1 point)
+LOST_AT = 2
+SAVED_AT = 8
+# Minimum local pre-scorer confidence needed to skip the LLM assessor
+LOCAL_SCORE_CONFIDENCE = 0.75
+# Local scores this close to a call-end threshold always go to the LLM assessor
+LOCAL_SCORE_MARGIN = 1
+# Agents whose responses are never cached because every call should be different.
+# Practice drills with scripted openings can empty this to replay callers cheaply.
+UNCACHED_AGENTS = {"PersonalityGenerator", "InitialCaller", "CallerAgent"}
+# Optional on-disk response cache (None keeps the cache in memory only)
+RESPONSE_CACHE_FILE = None
+# Stages shown in the perf overlay (F3)
+PERF_HUD_STAGES = (
+    "PersonalityGenerator", "InitialCaller", "CallerAgent",
+    "MentalHealthAssessor", "ConversationSummarizer", "render_ui", "wrap_text",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def call_outcome(health, lost_at=None, saved_at=None):
+    """'lost' or 'saved' if a score ends the call (at the LOST_AT / SAVED_AT thresholds
+    unless others are given), otherwise None."""
+    if health <= (LOST_AT if lost_at is None else lost_at):
+        return 'lost'
+    if health >= (SAVED_AT if saved_at is None else saved_at):
+        return 'saved'
+    return None
 
-def wrap_text(text: str, font: pygame.font.Font, max_width: int) -> list[str]:
-    """Wrap text into lines that fit within max_width using the given font."""
-    words = text.split(' ')
-    lines: list[str] = []
-    current = ''
-    for word in words:
-        test = (current + ' ' + word).strip()
-        if font.size(test)[0] <= max_width:
-            current = test
-        else:
-            if current:
-                lines.append(current)
-            current = word
-    if current:
-        lines.append(current)
-    return lines
-
-def wrap_text(text: str, font: pygame.font.Font, max_width: int) -> list[str]:
-    """Wrap text into lines that fit within max_width using the given font."""
-    words = text.split(' ')
-    lines: list[str] = []
-    current = ''
-    for word in words:
-        test = (current + ' ' + word).strip()
-        if font.size(test)[0] <= max_width:
-            current = test
-        else:
-            if current:
-                lines.append(current)
-            current = word
-    if current:
-        lines.append(current)
-    return lines
 
 class Game:
-    # Path to high scores file (persisted across runs)
+    # Path to high scores database (persisted across runs, shared by concurrent sessions)
+    HIGH_SCORES_DB = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), 'high_scores.sqlite3'
+    )
+    # Legacy high scores file, imported into the database on first run
     HIGH_SCORES_FILE = os.path.join(
         os.path.dirname(os.path.dirname(__file__)), 'high_scores.json'
     )
 
-    def __init__(self, api_key, player_name):
-        # Configure OpenAI
-        openai.api_key = api_key
+    def __init__(self, api_key, player_name, response_cache=None, backend=None, recorder=None,
+                 router=None, executor=None, high_scores=None, scheduler=None):
         self.api_key = api_key
+        # Backend that answers agent calls (the Agents SDK unless a local stub is plugged in)
+        self.backend = backend or AgentsBackend(api_key)
         self.player_name = player_name
         self.score = 0
-        # Load existing high scores
-        self.high_scores = self.load_high_scores()
-        self.player_best_score = self.high_scores.get(player_name, 0)
+        # Load existing high scores (or use a store shared with other sessions)
+        self.high_scores = high_scores or self.load_high_scores()
+        self.player_best_score = self.high_scores.get(player_name) if player_name else 0
         # References set from main
         self.screen = None
         self.clock = None
@@ -71,82 +136,183 @@ class Game:
         self.last_caller_text = ""
         self.last_player_text = ""
         self.notifications: list[dict] = []
+        # Text typed into the input box (kept while requests are in flight, so players can type ahead)
+        self.input_text = ""
         # Initialize previous health score for delta calculations
         self.prev_health_score = 5
+        # Streamed reply deltas only reach the screen while their request is current
+        self._reply_lock = threading.Lock()
+        self._reply_id = 0
+        # Per-stage latency histograms (and optional JSONL trace / profile)
+        self.perf = recorder or perf.RECORDER
+        self.show_perf_hud = False
+        self._hud_lines: tuple = ()
+        self._hud_updated = 0.0
+        self.turn_index = 0
+        # Startup milestones (set from main) to report time to the first caller
+        self.startup = None
+        # Picks the model tier for each agent call and enforces its latency budget
+        self.router = router or ModelRouter(AGENT_ROUTES, self.perf, default_model=DEFAULT_MODEL)
+        # Retries transient failures, trips a circuit per model and hedges slow calls
+        self.executor = executor or CallExecutor(self.perf)
+        # Every backend request waits here for a slot and rate budget, most urgent first
+        self.scheduler = scheduler or FairScheduler(
+            AGENT_CONCURRENCY, RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_TPM),
+            priorities=AGENT_PRIORITIES, recorder=self.perf,
+        )
+        # Record/replay: journal of this session, or the recording being replayed
+        self.cassette = None
+        self.replay = None
+        self.scripted_inputs = None
+        self._replay_start = 0.0
+        # Repeated agent calls are answered from the response cache
+        self.response_cache = response_cache or ResponseCache(
+            path=RESPONSE_CACHE_FILE, bypass=UNCACHED_AGENTS
+        )
+        # Clear-cut turns are scored locally; only uncertain ones go to the LLM assessor
+        self.local_scorer = LocalScorer()
+        self.scoring_stats = ScoringStats()
+        # All agent calls run on one long-lived event loop
+        self.agent_loop = AgentLoop()
+        # Next callers are built in the background while the current call is running
+        self.prefetcher = CallerPrefetcher(self.agent_loop, self.build_caller, size=PREFETCH_SIZE)
+
+    def set_player(self, player_name):
+        """Set the player's name once it has been entered.
+
+        The Game is created as soon as the API key is known, so the backend and the
+        first callers can warm up while the player is still typing their name.
+        """
+        self.player_name = player_name
+        self.player_best_score = self.high_scores.get(player_name)
+        if self.cassette is not None:
+            self.cassette.note_player(player_name)
+
+    def warm_up(self):
+        """Connect the backend and start building callers in the background."""
+        self.agent_loop.submit(self.backend.warm_up())
+        self.prefetcher.start()
 
     def load_high_scores(self):
-        """Load high scores from disk, return dict mapping names to scores."""
-        try:
-            with open(self.HIGH_SCORES_FILE, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+        """Open the high score store, importing the legacy JSON file on first use."""
+        return HighScoreStore(self.HIGH_SCORES_DB, import_from=self.HIGH_SCORES_FILE)
 
     def save_high_scores(self):
         """Save updated high scores to disk."""
-        # Update this player's high score if current score is higher
-        if self.score > self.high_scores.get(self.player_name, 0):
-            self.high_scores[self.player_name] = self.score
-        with open(self.HIGH_SCORES_FILE, 'w') as f:
-            json.dump(self.high_scores, f, indent=4)
+        # Atomic upsert: only replaces this player's high score if the current score is higher
+        self.high_scores.record(self.player_name, self.score)
     def add_notification(self, delta: int):
         """Add a fading notification for mental health change."""
         text = f"+{delta}" if delta > 0 else str(delta)
         self.notifications.append({'text': text, 'alpha': 255})
 
-    def generate_personality(self):
+    async def run_agent(self, name, instructions, prompt, model=None, on_delta=None, fallback=None):
+        """Run a single-turn agent and return its stripped text output.
+
+        If `on_delta` is given the run is streamed and `on_delta(partial_text)` is
+        called with the text received so far each time new tokens arrive. Responses
+        of agents that are not bypassed are served from the response cache. The model
+        comes from the agent's route in AGENT_ROUTES unless `model` is given;
+        `fallback()` can supply the local default if every tier misses its deadline
+        (defaults are not cached).
+        """
+        route = self.router.route_for(name, model)
+        cache_model = route.tiers[0][0]
+        use_cache = self.response_cache.enabled_for(name)
+        if use_cache:
+            cached = self.response_cache.get(name, cache_model, instructions, prompt)
+            if cached is not None:
+                if on_delta is not None:
+                    on_delta(cached)
+                return cached
+        tokens = estimate_tokens(instructions) + estimate_tokens(prompt)
+        self.perf.record_value(f"prompt_tokens.{name}", tokens)
+
+        async def request(tier_model, delta):
+            async with self.scheduler.slot(name, tokens):
+                return await self.backend.run(name, instructions, prompt, tier_model, delta)
+
+        async def call(tier_model, tier_on_delta):
+            with self.perf.span(name, prompt_tokens=tokens, model=str(tier_model)):
+                return await self.executor.run(
+                    name, tier_model, lambda delta: request(tier_model, delta),
+                    tier_on_delta, hedge=name in HEDGED_AGENTS
+                )
+
+        routed = await self.router.run(name, route, call, on_delta, fallback)
+        # A local stand-in is only good for this call: never let it answer later ones
+        if use_cache and not routed.is_default:
+            self.response_cache.put(name, cache_model, instructions, prompt, routed.text)
+        return routed.text
+
+    async def generate_personality(self):
         """Generate a one-paragraph personality for a suicidal hotline caller using Agent SDK."""
         prompt = (
             "Generate a one-paragraph personality description for a person "
             "calling a suicide hotline. Include their background, age, "
             "emotional state, and reasons they might be feeling distressed."
         )
-        personality_agent = Agent(
-            name="PersonalityGenerator",
-            instructions="You are an expert in human behavior.",
-            model=DEFAULT_MODEL
+        return await self.run_agent(
+            "PersonalityGenerator", "You are an expert in human behavior.", prompt
         )
-        result = asyncio.run(Runner.run(personality_agent, prompt))
-        return result.final_output.strip()
 
-    def get_initial_caller(self, personality):
+    async def get_initial_caller(self, personality):
         """Start conversation by having caller speak first using Agent SDK."""
         instructions = (
             f"You are a suicidal hotline caller. Here is your personality: {personality}. "
             "Begin the conversation by expressing your feelings and asking for help."
         )
-        start_agent = Agent(
-            name="InitialCaller",
-            instructions=instructions,
-            model=DEFAULT_MODEL
-        )
-        result = asyncio.run(Runner.run(start_agent, ""))
-        return result.final_output.strip()
-
-    def get_caller_response(self, user_input, personality, chat_history):
-        """Get the caller's next response based on conversation history using Agent SDK."""
-        # Build conversation context text
-        history_text = "".join(
-            f"{speaker}: {msg}\n" for speaker, msg in chat_history
-        )
+        return await self.run_agent("InitialCaller", instructions, "")
+
+    async def get_caller_response(self, user_input, personality, chat_history, on_delta=None):
+        """Get the caller's next response based on conversation history using Agent SDK.
+
+        `chat_history` is a ConversationContext, which keeps the history text within
+        the token budget (recent turns verbatim, older turns summarized).
+        """
+        # Conversation context text, maintained incrementally
+        history_text = chat_history.prompt_text()
         instructions = (
             f"You are a suicidal hotline caller. Here is your personality: {personality}. "
             "Given the conversation so far below and the counselor's latest message, respond as the caller in character."
         )
         # Combine conversation context and latest counselor message as input
         full_input = history_text + f"Counselor: {user_input}"
-        conv_agent = Agent(
-            name="CallerAgent",
-            instructions=instructions,
-            model=DEFAULT_MODEL
+        return await self.run_agent("CallerAgent", instructions, full_input, on_delta=on_delta)
+
+    async def summarize_conversation(self, summary, turns_text):
+        """Fold older conversation turns into the rolling summary used by ConversationContext."""
+        instructions = (
+            "You summarize a conversation between a suicide hotline caller and a counselor. "
+            "Update the existing summary with the new turns, keeping facts about the caller, "
+            "what they have shared and how they are feeling. "
+            f"Respond with the updated summary only, in at most {CONTEXT_TOKEN_BUDGET // 8} words."
+        )
+        prompt = f"Existing summary: {summary or '(none)'}\n\nNew turns:\n{turns_text}"
+        return await self.run_agent("ConversationSummarizer", instructions, prompt)
+
+    def new_context(self, first_text):
+        """Create the bounded conversation context for a new call."""
+        return ConversationContext(
+            [("Caller", first_text)],
+            budget_tokens=CONTEXT_TOKEN_BUDGET,
+            summarize=self.summarize_conversation,
+            submit=self.agent_loop.spawn,
+            labels={"You": "Counselor"},
         )
-        result = asyncio.run(Runner.run(conv_agent, full_input))
-        return result.final_output.strip()
 
-    def score_mental_health(self, chat_history):
+    async def score_mental_health(self, chat_history):
         """Assess caller's mental health on a scale of 1-10 using Agent SDK."""
         # Build conversation context text from the last up to 3 messages
         snippet = chat_history[-3:]
+        # Try the local pre-scorer first. Its score is only trusted clear of the call-end
+        # thresholds, so a call is never won or lost on a lexicon estimate.
+        local_score, confidence = self.local_scorer.score(snippet)
+        if (confidence >= LOCAL_SCORE_CONFIDENCE
+                and LOST_AT + LOCAL_SCORE_MARGIN < local_score < SAVED_AT - LOCAL_SCORE_MARGIN):
+            self.scoring_stats.record(local=True)
+            return local_score
+        self.scoring_stats.record(local=False)
         conv_text = "".join(
             f"{speaker}: {msg}\n" for speaker, msg in snippet
         )
@@ -154,12 +320,11 @@ class Game:
             "You are a mental health assessor. You will be given a conversation between a caller and a counselor in the input. "
             "Rate the caller's current mental health on a scale of 1 to 10, where 1 is very low and 10 is perfectly healthy. Respond with only the integer."
         )
-        scoring_agent = Agent(
-            name="MentalHealthAssessor",
-            instructions=instructions
+        # If the assessor misses its deadline use the local score, kept clear of the call-end thresholds
+        content = await self.run_agent(
+            "MentalHealthAssessor", instructions, conv_text,
+            fallback=lambda: str(max(LOST_AT + 1, min(SAVED_AT - 1, local_score)))
         )
-        result = asyncio.run(Runner.run(scoring_agent, conv_text))
-        content = result.final_output.strip()
         digits = ''.join(ch for ch in content if ch.isdigit())
         try:
             val = int(digits)
@@ -167,8 +332,122 @@ class Game:
         except ValueError:
             return 5
 
+    async def build_caller(self):
+        """Build a caller for the prefetch queue.
+
+        The opening line is scored in a separate task so the caller can be put
+        through (and the line shown) before the initial score is in.
+        """
+        # Everything done for a caller who is not on the line yet is background work
+        token = PRIORITY.set(BACKGROUND)
+        try:
+            personality = await self.generate_personality()
+            first_text = await self.get_initial_caller(personality)
+            health = asyncio.ensure_future(self.score_mental_health([("Caller", first_text)]))
+        finally:
+            PRIORITY.reset(token)
+        return PrefetchedCaller(personality, first_text, health)
+
+    def load_replay(self, cassette_backend):
+        """Replay a recorded session: the backend serves the agent responses and the
+        recorded player messages are sent instead of keyboard input."""
+        self.backend = self.replay = cassette_backend
+        # Replays never reach the provider, so its rate limits do not apply
+        self.scheduler.limiter = None
+        # Each recorded response answers exactly one request: a hedge or a retry would
+        # take the next call's response and every later call would mismatch
+        self.executor = CallExecutor(self.perf, RetryPolicy(attempts=1), hedge_min_samples=sys.maxsize)
+        self.scripted_inputs = deque(cassette_backend.inputs)
+
+    def end_session(self):
+        """Stop background work and persist the player's score."""
+        self.prefetcher.close()
+        self.agent_loop.stop()
+        if self.replay is not None:
+            # Replays never touch the real leaderboard
+            logger.info("Replay finished: %s", self.replay.report())
+        else:
+            self.save_high_scores()
+        if self.cassette is not None:
+            self.cassette.close()
+        self.perf.close()
+        logger.info("Session ended: %s", self.scoring_stats)
+        logger.info("Response cache: %s", self.response_cache.stats())
+        logger.info("Model routing: %s", self.router.stats())
+        logger.info("Retries and hedging: %s", self.executor.stats())
+        logger.info("Scheduler: %s", self.scheduler.stats())
+
     def render_ui(self, input_text):
-        """Render the game UI: background, chat, health, input box, quit button."""
+        """Render the game UI: background, chat, health, input box, quit button.
+
+        Only regions whose content changed since the last frame are repainted. Returns
+        the dirty rects, to be passed to `pygame.display.update`.
+        """
+        start = time.perf_counter()
+        self.dirty.begin('call')
+        self.mark_regions(input_text)
+        rects = self.dirty.take()
+        # Repaint the scene once per dirty rect; clipping keeps each pass to that rect
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.paint_ui(input_text)
+        self.screen.set_clip(None)
+        self.fade_notifications()
+        if rects:
+            self.perf.record('render_ui', time.perf_counter() - start, dirty=len(rects))
+        return rects
+
+    def mark_regions(self, input_text):
+        """Mark each region of the call screen with the content it currently shows."""
+        score_surf, health_surf = self.header_labels()
+        self.dirty.mark('score', score_surf.get_rect(topleft=(20, 15)), self.score)
+        self.dirty.mark('health', health_surf.get_rect(topleft=(220, 15)), self.current_health_score)
+        self.dirty.mark('slider', self.slider_rect, self.current_health_score)
+        self.dirty.mark(
+            'notifications', self.notification_rect,
+            tuple((n['text'], n['alpha']) for n in self.notifications)
+        )
+        self.dirty.mark('chat', self.chat_rect, (self.last_caller_text, self.last_player_text))
+        self.dirty.mark('input', self.input_area_rect, input_text)
+        if self.show_perf_hud:
+            self.dirty.mark('perf_hud', self.perf_hud_rect, self.perf_hud_lines())
+
+    def perf_hud_lines(self):
+        """Text of the perf overlay: current frame time and p50/p95 per stage (refreshed twice a second)."""
+        now = time.monotonic()
+        if now - self._hud_updated >= 0.5:
+            self._hud_updated = now
+            lines = [f"frame {self.perf.last('render_ui') * 1000:.2f} ms  (F3 to hide)"]
+            for stage in PERF_HUD_STAGES:
+                if stage in self.perf.histograms:
+                    p50, p95 = self.perf.percentiles(stage)
+                    lines.append(f"{stage[:20]:<20} p50 {p50 * 1000:7.1f}  p95 {p95 * 1000:7.1f} ms")
+            self._hud_lines = tuple(lines)
+        return self._hud_lines
+
+    def paint_perf_hud(self):
+        """Paint the perf overlay in the top right of the chat area."""
+        hud = pygame.Surface(self.perf_hud_rect.size, pygame.SRCALPHA)
+        hud.fill((0, 0, 0, 180))
+        self.screen.blit(hud, self.perf_hud_rect)
+        y = self.perf_hud_rect.y + 4
+        for line in self._hud_lines:
+            surf = self.layout_cache.render_line(line, self.font_hud, (120, 255, 120))
+            self.screen.blit(surf, (self.perf_hud_rect.x + 6, y))
+            y += self.font_hud.get_height()
+
+    def header_labels(self):
+        """Return the (cached) score and mental health label surfaces."""
+        score_surf = self.layout_cache.render_line(
+            f"Score: {self.score}", self.font_medium, (255, 255, 255)
+        )
+        health_surf = self.layout_cache.render_line(
+            f"Mental Health: {self.current_health_score}", self.font_medium, (255, 255, 255)
+        )
+        return score_surf, health_surf
+
+    def paint_ui(self, input_text):
+        """Paint the whole call screen (callers clip this to the dirty rects)."""
         # Fetch screen dimensions
         w = self.screen.get_width()
         h = self.screen.get_height()
@@ -176,33 +455,17 @@ class Game:
         self.screen.blit(self.background, (0, 0))
         # Draw header panel
         self.screen.blit(self.header_panel, (0, 0))
-        # Score display
-        score_surf = self.font_medium.render(f"Score: {self.score}", True, (255, 255, 255))
+        # Score and mental health display
+        score_surf, health_surf = self.header_labels()
         self.screen.blit(score_surf, (20, 15))
-        # Mental health display
-        health_surf = self.font_medium.render(
-            f"Mental Health: {self.current_health_score}", True, (255, 255, 255)
-        )
         self.screen.blit(health_surf, (220, 15))
         # Quit button
-        quit_rect = pygame.Rect(w - 100, 15, 80, 30)
-        pygame.draw.rect(self.screen, (200, 0, 0), quit_rect)
-        quit_surf = self.font_small.render("Quit", True, (255, 255, 255))
-        self.screen.blit(quit_surf, (quit_rect.x + 20, quit_rect.y + 5))
-        self.quit_rect = quit_rect
+        self.draw_quit_button()
 
         # Draw mental health slider
-        header_h = self.header_panel.get_height()
-        slider_x = 20
-        slider_y = header_h + 10
-        slider_width = w - 40
-        slider_height = 10
+        slider_x, slider_y, slider_width, slider_height = self.slider_rect
         # Slider background
-        pygame.draw.rect(
-            self.screen,
-            (100, 100, 100),
-            (slider_x, slider_y, slider_width, slider_height)
-        )
+        pygame.draw.rect(self.screen, (100, 100, 100), self.slider_rect)
         # Slider fill based on health (1-10)
         fill_w = int((self.current_health_score - 1) / 9 * slider_width)
         pygame.draw.rect(
@@ -211,44 +474,36 @@ class Game:
             (slider_x, slider_y, fill_w, slider_height)
         )
         # Draw notifications
-        for notif in list(self.notifications):
-            notif_surf = self.font_medium.render(notif['text'], True, (255, 255, 0))
+        for notif in self.notifications:
+            notif_surf = self.layout_cache.render_line(notif['text'], self.font_medium, (255, 255, 0))
             notif_surf.set_alpha(notif['alpha'])
             nx = w // 2 - notif_surf.get_width() // 2
             ny = slider_y - notif_surf.get_height() - 5
             self.screen.blit(notif_surf, (nx, ny))
-            notif['alpha'] -= 4
-            if notif['alpha'] <= 0:
-                self.notifications.remove(notif)
 
         # Conversation area: show only latest caller and player messages
-        header_h = self.header_panel.get_height()
-        input_h = self.input_panel.get_height()
-        region_start_y = header_h + slider_height + 20
-        region_end_y = h - input_h - 20
+        region_start_y = self.chat_rect.y
+        region_end_y = self.chat_rect.bottom - 20
         region_height = region_end_y - region_start_y
         mid_y = region_start_y + region_height // 2
         max_text_width = w - 60
-        # Caller message in top half
+        # Caller message in top half (only the new tail of a streamed reply is rewrapped)
         if self.last_caller_text:
             pref = "Caller: " + self.last_caller_text
-            lines = wrap_text(pref, self.font_small, max_text_width)
+            lines = self.caller_wrapper.wrap(pref)
             y = region_start_y
-            for line in lines:
-                surf = self.font_small.render(line, True, (240, 240, 240))
+            for surf in self.layout_cache.render_lines(lines, self.font_small, (240, 240, 240)):
                 self.screen.blit(surf, (30, y))
                 y += surf.get_height() + 2
         # Player message in bottom half
         if self.last_player_text:
             pref2 = f"{self.player_name}: " + self.last_player_text
-            lines2 = wrap_text(pref2, self.font_small, max_text_width)
             y2 = mid_y
-            for line in lines2:
-                surf = self.font_small.render(line, True, (200, 200, 255))
+            for surf in self.layout_cache.layout(pref2, self.font_small, max_text_width, (200, 200, 255)):
                 self.screen.blit(surf, (30, y2))
                 y2 += surf.get_height() + 2
         # Draw input panel
-        self.screen.blit(self.input_panel, (20, h - self.input_panel.get_height()))
+        self.screen.blit(self.input_panel, self.input_area_rect)
         # Input area
         input_h = self.input_panel.get_height()
         input_rect = pygame.Rect(
@@ -258,18 +513,20 @@ class Game:
             input_h - 10
         )
         pygame.draw.rect(self.screen, (255, 255, 255), input_rect, 2)
-        # Render multi-line input text with wrapping
+        # Render multi-line input text with wrapping; finished lines come from the cache and
+        # the line being typed is rewrapped incrementally
         raw_lines = input_text.split('\n')
         wrapped_lines: list[str] = []
         max_width = input_rect.width - 10
-        for line in raw_lines:
-            wrapped_lines.extend(wrap_text(line, self.font_small, max_width))
+        for line in raw_lines[:-1]:
+            wrapped_lines.extend(self.layout_cache.wrap(line, self.font_small, max_width))
+        wrapped_lines.extend(self.input_wrapper.wrap(raw_lines[-1]))
         # Only display the bottom-most lines that fit
         line_height = self.font_small.get_height() + 2
         max_lines = input_rect.height // line_height
         display_lines = wrapped_lines[-max_lines:]
         for idx, line in enumerate(display_lines):
-            txt_surf = self.font_small.render(line, True, (255, 255, 255))
+            txt_surf = self.layout_cache.render_line(line, self.font_small, (255, 255, 255))
             self.screen.blit(
                 txt_surf,
                 (
@@ -277,59 +534,198 @@ class Game:
                     input_rect.y + 5 + idx * line_height
                 )
             )
+        # Perf overlay on top of everything else
+        if self.show_perf_hud:
+            self.paint_perf_hud()
+
+    def fade_notifications(self):
+        """Advance the fade-out of health change notifications by one frame."""
+        for notif in list(self.notifications):
+            notif['alpha'] -= 4
+            if notif['alpha'] <= 0:
+                self.notifications.remove(notif)
+
+    def next_events(self, busy=False):
+        """Return the events for the next frame.
+
+        While a notification is fading (or a request is in flight, `busy`) this ticks at
+        30 fps; otherwise it sleeps in `pygame.event.wait` until there is input.
+        """
+        if self.notifications or busy:
+            self.clock.tick(30)
+            return pygame.event.get()
+        return wait_events()
+
+    def handle_event(self, event):
+        """Apply a pygame event to the input box.
+
+        Returns 'submit', 'quit' or 'cancel' when the event asks for it, otherwise None.
+        """
+        if event.type == pygame.QUIT:
+            self.end_session()
+            pygame.quit()
+            sys.exit()
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            # The window contents were lost: repaint everything on the next frame
+            self.dirty.invalidate()
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.quit_rect.collidepoint(event.pos):
+                return 'quit'
+        if event.type == pygame.KEYDOWN:
+            mods = pygame.key.get_mods()
+            if event.key == pygame.K_ESCAPE:
+                return 'cancel'
+            if event.key == pygame.K_F3:
+                # Toggle the perf overlay
+                self.show_perf_hud = not self.show_perf_hud
+                self.dirty.invalidate()
+                return None
+            if event.key == pygame.K_RETURN:
+                # Shift+Enter for newline, Enter alone to submit
+                if mods & pygame.KMOD_SHIFT:
+                    self.input_text += '\n'
+                else:
+                    return 'submit'
+            elif event.key == pygame.K_BACKSPACE:
+                self.input_text = self.input_text[:-1]
+            else:
+                self.input_text += event.unicode
+        return None
 
     def get_player_input(self):
         """Handle text input and detect quit button."""
-        input_text = ''
+        if self.scripted_inputs is not None:
+            return self.next_scripted_input()
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.save_high_scores()
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if self.quit_rect.collidepoint(event.pos):
-                        return None
-                if event.type == pygame.KEYDOWN:
-                    mods = pygame.key.get_mods()
-                    if event.key == pygame.K_RETURN:
-                        # Shift+Enter for newline, Enter alone to submit
-                        if mods & pygame.KMOD_SHIFT:
-                            input_text += '\n'
-                        else:
-                            return input_text
-                    elif event.key == pygame.K_BACKSPACE:
-                        input_text = input_text[:-1]
-                    else:
-                        input_text += event.unicode
-            self.render_ui(input_text)
-            pygame.display.flip()
-            self.clock.tick(30)
+            pygame.display.update(self.render_ui(self.input_text))
+            for event in self.next_events():
+                action = self.handle_event(event)
+                if action == 'quit':
+                    return None
+                if action == 'submit':
+                    text, self.input_text = self.input_text, ''
+                    if self.cassette is not None:
+                        self.cassette.note_input(text)
+                    return text
+
+    def next_scripted_input(self):
+        """Replay: return the next recorded player message, or None when the recording ends.
+
+        With recorded pacing the message is sent at its original offset into the session.
+        """
+        if not self.scripted_inputs:
+            return None
+        offset, text = self.scripted_inputs.popleft()
+        due = self._replay_start + offset if self.replay.pacing == 'recorded' else 0.0
+        while True:
+            pygame.display.update(self.render_ui(self.input_text))
+            if time.monotonic() >= due:
+                return text
+            for event in self.next_events(busy=True):
+                if self.handle_event(event) == 'quit':
+                    return None
+
+    def wait_for(self, future, render=None):
+        """Keep rendering and handling input until `future` (a concurrent future) is done.
+
+        The player can keep typing ahead while waiting. Escape cancels the request and
+        raises `concurrent.futures.CancelledError`; Quit cancels it and ends the session.
+        """
+        render = render or (lambda: self.render_ui(self.input_text))
+        while not future.done():
+            pygame.display.update(render())
+            for event in self.next_events(busy=True):
+                action = self.handle_event(event)
+                if action == 'quit':
+                    future.cancel()
+                    self.end_session()
+                    self.show_leaderboard()
+                if action == 'cancel':
+                    future.cancel()
+        return future.result()
+
+    def render_loading(self):
+        """Render the loading screen shown while waiting for a new caller; returns the dirty rects."""
+        self.dirty.begin('loading')
+        rects = self.dirty.take()
+        if not rects:
+            return rects
+        w, h = self.screen.get_size()
+        self.screen.blit(self.background, (0, 0))
+        self.screen.blit(self.header_panel, (0, 0))
+        self.draw_quit_button()
+        loading_text = "Generating new caller..."
+        load_surf = self.font_medium.render(loading_text, True, (255, 255, 255))
+        self.screen.blit(load_surf, (
+            w // 2 - load_surf.get_width() // 2,
+            h // 2 - load_surf.get_height() // 2
+        ))
+        return rects
+
+    def draw_quit_button(self):
+        """Draw the Quit button in the header and remember its rect for hit-testing."""
+        quit_rect = pygame.Rect(self.screen.get_width() - 100, 15, 80, 30)
+        pygame.draw.rect(self.screen, (200, 0, 0), quit_rect)
+        quit_surf = self.font_small.render("Quit", True, (255, 255, 255))
+        self.screen.blit(quit_surf, (quit_rect.x + 20, quit_rect.y + 5))
+        self.quit_rect = quit_rect
+
+    def partial_reply_handler(self):
+        """Streaming callback for a new caller reply, silenced by `drop_partial_replies`."""
+        with self._reply_lock:
+            self._reply_id += 1
+            reply_id = self._reply_id
+        return lambda text: self.show_partial_reply(text, reply_id)
+
+    def drop_partial_replies(self):
+        """Ignore deltas still arriving for a cancelled reply (one may already be running on the loop)."""
+        with self._reply_lock:
+            self._reply_id += 1
+
+    def show_partial_reply(self, text, reply_id=None):
+        """Show a streamed caller reply as it arrives (called from the agent loop thread)."""
+        with self._reply_lock:
+            if text and (reply_id is None or reply_id == self._reply_id):
+                self.last_caller_text = text
+
+    def update_health(self, mh):
+        """Apply a new mental health score and show the change."""
+        delta = mh - self.prev_health_score
+        self.add_notification(delta)
+        self.prev_health_score = mh
+        self.current_health_score = mh
 
     def show_leaderboard(self):
         """Display the leaderboard until user exits."""
-        sorted_scores = sorted(
-            self.high_scores.items(), key=lambda x: x[1], reverse=True
-        )
+        sorted_scores = self.high_scores.top(10)
+        # The leaderboard is static: paint it once, then sleep until input (or a re-expose)
+        repaint = True
         while True:
-            for event in pygame.event.get():
+            if repaint:
+                self.paint_leaderboard(sorted_scores)
+                pygame.display.flip()
+                repaint = False
+            for event in wait_events():
                 if event.type in (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
                     pygame.quit()
                     sys.exit()
-            self.screen.fill((0, 0, 0))
-            title = self.font_medium.render("Leaderboard", True, (255, 255, 255))
-            self.screen.blit(title, (300, 50))
-            y = 120
-            for name, sc in sorted_scores[:10]:
-                line = f"{name}: {sc}"
-                surf = self.font_small.render(line, True, (255, 255, 255))
-                self.screen.blit(surf, (300, y))
-                y += 30
-            pygame.display.flip()
-            self.clock.tick(30)
+                if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    repaint = True
 
-    def run(self):
-        """Main game loop: handles calls, conversation, and scoring using Agent SDK."""
+    def paint_leaderboard(self, sorted_scores):
+        """Paint the top 10 leaderboard entries."""
+        self.screen.fill((0, 0, 0))
+        title = self.font_medium.render("Leaderboard", True, (255, 255, 255))
+        self.screen.blit(title, (300, 50))
+        y = 120
+        for name, sc in sorted_scores[:10]:
+            line = f"{name}: {sc}"
+            surf = self.font_small.render(line, True, (255, 255, 255))
+            self.screen.blit(surf, (300, y))
+            y += 30
+
+    def setup_screen(self):
+        """Create the fonts, panels and screen regions of the call screen."""
         # Initialize fonts
         self.font_small = pygame.font.Font(None, 24)
         self.font_medium = pygame.font.Font(None, 36)
@@ -346,6 +742,26 @@ class Game:
         self.chat_panel.fill((30, 30, 50))
         self.input_panel = pygame.Surface((w - 40, 80))
         self.input_panel.fill((40, 40, 60))
+        self.quit_rect = pygame.Rect(w - 100, 15, 80, 30)
+        # Text layout caches: wrapped lines and rendered line surfaces are reused across frames
+        self.layout_cache = LayoutCache()
+        self.caller_wrapper = IncrementalWrapper(self.font_small, w - 60)
+        self.input_wrapper = IncrementalWrapper(self.font_small, w - 50)
+        # Screen regions tracked for dirty-rectangle repaints
+        input_h = self.input_panel.get_height()
+        self.slider_rect = pygame.Rect(20, header_h + 10, w - 40, 10)
+        notif_h = self.font_medium.get_height()
+        self.notification_rect = pygame.Rect(w // 2 - 40, self.slider_rect.y - notif_h - 5, 80, notif_h)
+        self.chat_rect = pygame.Rect(0, self.slider_rect.bottom + 20, w, h - input_h - self.slider_rect.bottom - 20)
+        self.input_area_rect = pygame.Rect(20, h - input_h, w - 40, input_h)
+        self.dirty = DirtyRegions(self.screen.get_rect())
+        self.font_hud = pygame.font.Font(None, 18)
+        hud_h = self.font_hud.get_height() * (len(PERF_HUD_STAGES) + 1) + 8
+        self.perf_hud_rect = pygame.Rect(w - 330, self.chat_rect.y, 320, hud_h)
+
+    def run(self):
+        """Main game loop: handles calls, conversation, and scoring using Agent SDK."""
+        self.setup_screen()
 
         # Game state
         # Initialize last messages and health state
@@ -354,46 +770,45 @@ class Game:
         self.current_health_score = 5
         # prev_health_score initialized in __init__
 
+        self._replay_start = time.monotonic()
+        if self.cassette is not None:
+            # Recorded input offsets count from here, as replayed ones do
+            self.cassette.mark_start()
+        # Start building callers in the background
+        self.prefetcher.start()
+
         # Loop over calls
         while True:
-            # Show loading indicator while generating new caller
-            self.screen.blit(self.background, (0, 0))
-            self.screen.blit(self.header_panel, (0, 0))
-            loading_text = "Generating new caller..."
-            load_surf = self.font_medium.render(loading_text, True, (255, 255, 255))
-            self.screen.blit(load_surf, (
-                w // 2 - load_surf.get_width() // 2,
-                h // 2 - load_surf.get_height() // 2
-            ))
-            pygame.display.flip()
-            self.clock.tick(30)
-            # 1. Generate new caller personality
-            personality = self.generate_personality()
-            # Reset last messages for new call
+            # 1-3. Take the next prefetched caller (personality, opening line, initial score),
+            # showing a loading indicator until one is ready
+            try:
+                personality, first_text, health = self.wait_for(
+                    self.prefetcher.get_future(), render=self.render_loading
+                )
+            except CancelledError:
+                # Escape on the loading screen: there is no message to take back, keep waiting
+                continue
+            if self.startup is not None and self.startup.mark('first_caller'):
+                logger.info("Startup: %s", self.startup.report())
+            # Reset last messages and health for new call
             self.last_caller_text = ""
             self.last_player_text = ""
+            self.current_health_score = self.prev_health_score = 5
 
-            # 2. Initial caller message
-            first_text = self.get_initial_caller(personality)
             # Track chat history for LLM
-            chat_history = [("Caller", first_text)]
-            # Update UI
+            chat_history = self.new_context(first_text)
+            # Update UI: show the opening line while its score is still being computed
             self.last_caller_text = first_text
-
-            # 3. Score initial mental health
-            mh = self.score_mental_health(chat_history)
-            # Show delta notification
-            delta = mh - self.prev_health_score
-            self.add_notification(delta)
-            self.prev_health_score = mh
-            self.current_health_score = mh
+            try:
+                self.update_health(self.wait_for(self.agent_loop.submit(health)))
+            except CancelledError:
+                # Escape while the opening line is scored: the caller starts at neutral
+                pass
 
             # Immediate termination
-            if self.current_health_score <= 2:
-                self.score -= 1
-                continue
-            if self.current_health_score >= 8:
-                self.score += 1
+            outcome = call_outcome(self.current_health_score)
+            if outcome is not None:
+                self.score += 1 if outcome == 'saved' else -1
                 continue
 
             # 4. Conversation loop
@@ -402,32 +817,43 @@ class Game:
                 user_input = self.get_player_input()
                 if user_input is None:
                     # Exit game
-                    self.save_high_scores()
+                    self.end_session()
                     self.show_leaderboard()
+                # Mark the turn (starts/stops an optional cProfile window)
+                self.turn_index += 1
+                self.perf.turn(self.turn_index)
                 # Record and display player message immediately
+                previous_caller_text = self.last_caller_text
+                previous_player_text = self.last_player_text
                 self.last_player_text = user_input
-                chat_history.append(("You", user_input))
-                # Show 'Thinking...' for caller
+                # Show 'Thinking...' for caller while the reply is generated off the render thread
                 self.last_caller_text = "Thinking..."
-                # Render updated UI
-                self.render_ui("")
-                pygame.display.flip()
-                self.clock.tick(30)
-                # Get caller response
-                caller_text = self.get_caller_response(user_input, personality, chat_history)
+                try:
+                    caller_text = self.wait_for(self.agent_loop.submit(
+                        self.get_caller_response(
+                            user_input, personality, chat_history,
+                            on_delta=self.partial_reply_handler() if STREAM_REPLIES else None
+                        )
+                    ))
+                except CancelledError:
+                    # Escape: take the message back so the player can edit and resend it
+                    self.drop_partial_replies()
+                    self.last_caller_text = previous_caller_text
+                    self.last_player_text = previous_player_text
+                    self.input_text = user_input + ('\n' + self.input_text if self.input_text else '')
+                    continue
                 self.last_caller_text = caller_text
+                chat_history.append(("You", user_input))
                 chat_history.append(("Caller", caller_text))
-                # Update mental health
-                mh = self.score_mental_health(chat_history)
-                delta = mh - self.prev_health_score
-                self.add_notification(delta)
-                self.prev_health_score = mh
-                self.current_health_score = mh
+                # Show the reply while it is being scored
+                try:
+                    self.update_health(self.wait_for(
+                        self.agent_loop.submit(self.score_mental_health(chat_history))
+                    ))
+                except CancelledError:
+                    continue
                 # Check for call end
-                if self.current_health_score <= 2:
-                    self.score -= 1
-                    break
-                if self.current_health_score >= 8:
-                    self.score += 1
+                outcome = call_outcome(self.current_health_score)
+                if outcome is not None:
+                    self.score += 1 if outcome == 'saved' else -1
                     break
-                    break
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Headless simulation of The People Person for load benchmarks.
+
+Drives the same call flow as Game.run (new caller, opening line, scoring,
+counselor/caller turns until the caller is saved or lost) without a window,
+against a pluggable backend, and reports throughput and per-stage latency.
+
+    python src/headless.py --sessions 20 --calls 5 --latency 0.4 --jitter 0.1
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from backends import AgentsBackend, Backend, StubBackend
+from context import estimate_tokens
+from game import AGENT_PRIORITIES, Game, call_outcome
+from perf import percentile
+from prescore import ScoringStats
+from ratelimit import RateLimiter, default_limits
+from scheduler import FairScheduler
+import perf
+
+# Lines used by the scripted counselor, in order (cycled for long calls)
+SCRIPTED_COUNSELOR = [
+    "Hi, thank you for calling. I'm here to listen. What's going on for you today?",
+    "That sounds really painful. How long have you been feeling this way?",
+    "I'm glad you reached out. Is there anyone in your life you feel you can talk to?",
+    "It makes sense that you're exhausted. What has helped you get through hard days before?",
+    "You matter, and I want to help you stay safe. Can we think about the next few hours together?",
+]
+
+
+class SimulationStats:
+    """Latency samples per stage, tokens sent per turn and completed calls."""
+
+    def __init__(self):
+        self.stages: dict[str, list[float]] = {}
+        self.turn_tokens: list[int] = []
+        self.calls = 0
+        self.saved = 0
+        self.lost = 0
+        self.routing: Counter = Counter()
+        self.resilience: Counter = Counter()
+        self.scheduler = {}
+        self.prescoring = ScoringStats()
+
+    def record(self, stage, seconds):
+        self.stages.setdefault(stage, []).append(seconds)
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'calls_completed': self.calls,
+            'calls_per_minute': round(self.calls / elapsed * 60, 2) if elapsed else 0.0,
+            'saved': self.saved,
+            'lost': self.lost,
+            'stages': {
+                stage: {
+                    'count': len(samples),
+                    'p50_ms': round(percentile(samples, 50) * 1000, 1),
+                    'p95_ms': round(percentile(samples, 95) * 1000, 1),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 1),
+                }
+                for stage, samples in sorted(self.stages.items())
+            },
+            'tokens_per_turn': {
+                'mean': round(sum(self.turn_tokens) / len(self.turn_tokens), 1) if self.turn_tokens else 0,
+                'p95': percentile(self.turn_tokens, 95),
+            },
+            'local_prescorer': {
+                'turns': self.prescoring.turns,
+                'local': self.prescoring.local,
+                'skip_rate': round(self.prescoring.skip_rate, 3),
+            },
+            'routing': dict(sorted(self.routing.items())),
+            'resilience': dict(sorted(self.resilience.items())),
+            'scheduler': self.scheduler,
+        }
+
+
+class MeteredBackend(Backend):
+    """Wraps a backend to time every call by agent name and count prompt tokens sent."""
+
+    def __init__(self, inner: Backend, stats: SimulationStats):
+        self.inner = inner
+        self.stats = stats
+        self.tokens_sent = 0
+
+    async def warm_up(self):
+        await self.inner.warm_up()
+
+    async def run(self, name, instructions, prompt, model, on_delta=None) -> str:
+        self.tokens_sent += estimate_tokens(instructions) + estimate_tokens(prompt)
+        start = time.perf_counter()
+        try:
+            return await self.inner.run(name, instructions, prompt, model, on_delta)
+        finally:
+            self.stats.record(name, time.perf_counter() - start)
+
+
+class HeadlessGame(Game):
+    """A Game that never touches the display or the shared high score database."""
+    HIGH_SCORES_DB = ':memory:'
+    HIGH_SCORES_FILE = None
+
+
+async def counselor_line(game: HeadlessGame, chat_history, turn: int, mode: str) -> str:
+    """Next counselor message: scripted, or generated by a CounselorAgent."""
+    if mode == 'scripted':
+        return SCRIPTED_COUNSELOR[turn % len(SCRIPTED_COUNSELOR)]
+    instructions = (
+        "You are a compassionate counselor on a suicide prevention hotline. "
+        "Reply to the caller in one or two supportive sentences."
+    )
+    return await game.run_agent("CounselorAgent", instructions, chat_history.prompt_text())
+
+
+async def run_session(index: int, backend: Backend, stats: SimulationStats, calls: int,
+                      max_turns: int, counselor: str, stream: bool, scheduler: FairScheduler):
+    """Play `calls` calls in one simulated session, mirroring the flow of Game.run."""
+    metered = MeteredBackend(backend, stats)
+    game = HeadlessGame("", f"sim-{index}", backend=metered, scheduler=scheduler)
+    for _ in range(calls):
+        # 1-3. New caller: personality, opening line and initial score
+        start = time.perf_counter()
+        caller = await game.build_caller()
+        health = await caller.health
+        stats.record('new_caller', time.perf_counter() - start)
+        chat_history = game.new_context(caller.first_text)
+        turn = 0
+        # 4. Conversation loop until the caller is saved or lost (or max_turns)
+        while call_outcome(health) is None and turn < max_turns:
+            user_input = await counselor_line(game, chat_history, turn, counselor)
+            tokens_before = metered.tokens_sent
+            start = time.perf_counter()
+            caller_text = await game.get_caller_response(
+                user_input, caller.personality, chat_history,
+                on_delta=(lambda text: None) if stream else None
+            )
+            chat_history.append(("You", user_input))
+            chat_history.append(("Caller", caller_text))
+            health = await game.score_mental_health(chat_history)
+            stats.record('turn', time.perf_counter() - start)
+            stats.turn_tokens.append(metered.tokens_sent - tokens_before)
+            turn += 1
+        stats.calls += 1
+        outcome = call_outcome(health)
+        if outcome == 'lost':
+            game.score -= 1
+            stats.lost += 1
+        elif outcome == 'saved':
+            game.score += 1
+            stats.saved += 1
+    stats.prescoring.turns += game.scoring_stats.turns
+    stats.prescoring.local += game.scoring_stats.local
+    stats.routing.update(game.router.stats())
+    stats.resilience.update(game.executor.stats())
+
+
+async def simulate(backend: Backend, sessions: int, calls: int, max_turns: int,
+                   counselor: str = 'scripted', stream: bool = False, concurrency: int = 64,
+                   rpm: float = 0, tpm: float = 0) -> dict:
+    """Run `sessions` simulated sessions concurrently and return the report.
+
+    All sessions share one scheduler, as they would share an API key; `rpm` and
+    `tpm` (0 for none) rate-limit it.
+    """
+    stats = SimulationStats()
+    limiter = RateLimiter(rpm, tpm) if rpm or tpm else None
+    scheduler = FairScheduler(concurrency, limiter, priorities=AGENT_PRIORITIES, recorder=perf.RECORDER)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(i, backend, stats, calls, max_turns, counselor, stream, scheduler)
+        for i in range(sessions)
+    ))
+    stats.scheduler = scheduler.stats()
+    return stats.report(time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless load benchmark for The People Person")
+    parser.add_argument('--sessions', type=int, default=1, help="concurrent simulated sessions")
+    parser.add_argument('--calls', type=int, default=3, help="calls per session")
+    parser.add_argument('--max-turns', type=int, default=10, help="turn limit per call")
+    parser.add_argument('--backend', choices=['stub', 'openai'], default='stub')
+    parser.add_argument('--latency', type=float, default=0.5, help="stub latency per call (s)")
+    parser.add_argument('--jitter', type=float, default=0.1, help="stub latency jitter (s)")
+    parser.add_argument('--seed', type=int, default=0, help="stub random seed")
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="fraction of stub calls that are slow")
+    parser.add_argument('--tail-latency', type=float, default=5.0, help="latency of slow stub calls (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of stub calls that fail")
+    parser.add_argument('--stub-rpm', type=int, default=0, help="stub answers 429 above this many requests/min")
+    parser.add_argument('--concurrency', type=int, default=64, help="agent calls in flight across sessions")
+    parser.add_argument('--rpm', type=float,
+                        help="client-side requests/min limit (default: the game's for openai, none for stub; 0: none)")
+    parser.add_argument('--tpm', type=float,
+                        help="client-side tokens/min limit (default: the game's for openai, none for stub; 0: none)")
+    parser.add_argument('--counselor', choices=['scripted', 'agent'], default='scripted')
+    parser.add_argument('--stream', action='store_true', help="stream caller replies")
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY'))
+    args = parser.parse_args(argv)
+
+    if args.backend == 'stub':
+        backend = StubBackend(latency=args.latency, jitter=args.jitter, seed=args.seed,
+                              tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+                              error_rate=args.error_rate, rpm_limit=args.stub_rpm)
+    else:
+        if not args.api_key:
+            parser.error("--backend openai needs --api-key or OPENAI_API_KEY")
+        backend = AgentsBackend(args.api_key)
+    args.rpm, args.tpm = default_limits(args.backend, args.rpm, args.tpm)
+    report = asyncio.run(simulate(
+        backend, args.sessions, args.calls, args.max_turns, args.counselor, args.stream,
+        args.concurrency, args.rpm, args.tpm
+    ))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
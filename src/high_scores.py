@@ -0,0 +1,91 @@
+"""
+SQLite-backed high score store for The People Person
+"""
+import json
+import sqlite3
+import threading
+import time
+
+
+class HighScoreStore:
+    """Players' best scores in an SQLite database.
+
+    Writes are atomic upserts that keep the higher score, the database runs in WAL
+    mode with a busy timeout so several game processes can record scores at once,
+    and the leaderboard is an indexed top-N query. On first open an existing
+    `high_scores.json` (name -> score) can be imported.
+    """
+
+    def __init__(self, path, import_from=None, timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                   isolation_level=None)
+        if path != ':memory:':
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "name TEXT PRIMARY KEY, score INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS scores_rank ON scores(score DESC, name)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if import_from:
+            self.import_json(import_from)
+
+    def get(self, name, default: int = 0) -> int:
+        """Best recorded score for a player."""
+        with self._lock:
+            row = self._db.execute("SELECT score FROM scores WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def record(self, name, score: int):
+        """Atomically store a score, keeping the player's best."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO scores (name, score, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET score = excluded.score, updated = excluded.updated "
+                "WHERE excluded.score > scores.score",
+                (name, int(score), time.time())
+            )
+
+    def top(self, n: int = 10) -> list[tuple[str, int]]:
+        """The n best players as (name, score), highest first."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT name, score FROM scores ORDER BY score DESC, name LIMIT ?", (n,)
+            ).fetchall()
+
+    def import_json(self, json_path) -> int:
+        """Import a legacy name -> score JSON file once; returns the number of entries imported."""
+        try:
+            with open(json_path, 'r') as f:
+                scores = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                done = self._db.execute(
+                    "SELECT 1 FROM meta WHERE key = 'json_imported'"
+                ).fetchone()
+                if done:
+                    self._db.execute("COMMIT")
+                    return 0
+                now = time.time()
+                self._db.executemany(
+                    "INSERT INTO scores (name, score, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET score = excluded.score "
+                    "WHERE excluded.score > scores.score",
+                    [(name, int(sc), now) for name, sc in scores.items()]
+                )
+                self._db.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (json_path,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(scores)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,21 +1,55 @@
+import time
+# Taken before the other imports, for the startup report
+STARTED = time.perf_counter()
+
 import pygame
 import sys
+import logging
+import argparse
+import threading
 import pyperclip
 
-from game import Game
+import perf
+from backends import AgentsBackend, load_sdk
+from cassette import CassetteBackend, CassetteRecorder
+from renderer import wait_events
+
+def preload():
+    """Import the game module and the Agents SDK on a background thread, so the
+    first screen appears at once and the imports finish while the player types."""
+    def load():
+        import game  # noqa: F401
+        load_sdk()
+    threading.Thread(target=load, name="Preload", daemon=True).start()
 
-def text_input(screen, clock, prompt, obfuscate_after=None):
+def text_input(screen, clock, prompt, obfuscate_after=None, on_shown=None):
     """Display a prompt and capture text input from the user.
     If obfuscate_after is an int, display only the first obfuscate_after characters
-    and mask the rest with '*' for security (e.g., API keys)."""
+    and mask the rest with '*' for security (e.g., API keys). on_shown is called
+    once the prompt is on screen."""
     font = pygame.font.Font(None, 32)
     input_text = ""
+    # Only the input line changes while typing: paint the prompt once and update that row
+    input_row = pygame.Rect(0, 240, screen.get_width(), font.get_height() + 10)
+    screen.fill((30, 30, 30))
+    prompt_surf = font.render(prompt, True, (255, 255, 255))
+    screen.blit(prompt_surf, (20, 200))
+    pygame.display.flip()
+    if on_shown is not None:
+        on_shown()
     while True:
-        for event in pygame.event.get():
+        changed = False
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                screen.fill((30, 30, 30))
+                screen.blit(prompt_surf, (20, 200))
+                pygame.display.flip()
+                changed = True
             if event.type == pygame.KEYDOWN:
+                changed = True
                 mods = pygame.key.get_mods()
                 # Handle paste from clipboard (Ctrl+V)
                 if (mods & pygame.KMOD_CTRL) and event.key == pygame.K_v:
@@ -30,35 +64,91 @@ def text_input(screen, clock, prompt, obfuscate_after=None):
                     input_text = input_text[:-1]
                 else:
                     input_text += event.unicode
+        if not changed:
+            continue
 
-        screen.fill((30, 30, 30))
-        prompt_surf = font.render(prompt, True, (255, 255, 255))
         # Obfuscate display if needed
         if obfuscate_after is not None and len(input_text) > obfuscate_after:
             display_text = input_text[:obfuscate_after] + '*' * (len(input_text) - obfuscate_after)
         else:
             display_text = input_text
         input_surf = font.render(display_text, True, (255, 255, 255))
-        screen.blit(prompt_surf, (20, 200))
+        screen.fill((30, 30, 30), input_row)
         screen.blit(input_surf, (20, 240))
-        pygame.display.flip()
-        clock.tick(30)
+        pygame.display.update(input_row)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="The People Person")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="append per-stage timings to a JSONL trace file")
+    parser.add_argument('--profile-turns', metavar='FIRST-LAST',
+                        help="capture a cProfile of the game thread for these player turns, e.g. 3-5")
+    parser.add_argument('--profile-out', metavar='PATH', default='turns.prof',
+                        help="where to write the --profile-turns capture")
+    parser.add_argument('--record', metavar='PATH',
+                        help="record agent requests/responses and your messages to a cassette file")
+    parser.add_argument('--replay', metavar='PATH',
+                        help="replay a recorded cassette offline (no API key needed)")
+    parser.add_argument('--replay-pacing', choices=['fast', 'recorded'], default='fast',
+                        help="serve replayed responses immediately or with their recorded latency")
+    parser.add_argument('--lines', type=int, default=1, metavar='N',
+                        help="run a switchboard with N concurrent callers (Tab switches lines)")
+    args = parser.parse_args(argv)
+    if args.lines < 1:
+        parser.error("--lines must be at least 1")
+    if args.lines > 1 and (args.record or args.replay):
+        # Cassettes replay one conversation in order; concurrent lines interleave
+        parser.error("--record and --replay need a single line")
+    return args
 
 def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    preload()
+    profile_turns = None
+    if args.profile_turns:
+        first, _, last = args.profile_turns.partition('-')
+        profile_turns = (int(first), int(last or first))
+    if args.trace or profile_turns:
+        perf.configure(trace_path=args.trace, profile_turns=profile_turns,
+                       profile_path=args.profile_out)
+    startup = perf.StartupTimer(STARTED)
     pygame.init()
     screen = pygame.display.set_mode((800, 600))
     pygame.display.set_caption("The People Person")
     clock = pygame.time.Clock()
 
-    # Prompt for API key and player name
-    api_key = text_input(screen, clock,
-                        "Enter your OpenAI API Key (Ctrl+V to paste):",
-                        obfuscate_after=4)
-    player_name = text_input(screen, clock, "Enter your gameplay name:")
+    if args.replay:
+        # Replays run offline from the cassette
+        from game import Game
+        replay = CassetteBackend(args.replay, pacing=args.replay_pacing)
+        game = Game("", replay.header.get('player') or "Replay", backend=replay)
+        game.load_replay(replay)
+    else:
+        # Prompt for API key
+        api_key = text_input(screen, clock,
+                            "Enter your OpenAI API Key (Ctrl+V to paste):",
+                            obfuscate_after=4, on_shown=lambda: startup.mark('first_frame'))
+
+        # Initialize the game now, so the client connects and the first callers are
+        # generated while the player is still typing their name
+        from game import Game
+        backend = AgentsBackend(api_key)
+        recorder = None
+        if args.record:
+            backend = recorder = CassetteRecorder(backend, args.record)
+        if args.lines > 1:
+            from switchboard import Switchboard
+            game = Switchboard(api_key, None, backend=backend, lines=args.lines)
+        else:
+            game = Game(api_key, None, backend=backend)
+        game.cassette = recorder
+        game.warm_up()
 
-    # Initialize and run the game
-    game = Game(api_key, player_name)
-    # Attach screen and clock to game for later use
+        # Prompt for player name
+        game.set_player(text_input(screen, clock, "Enter your gameplay name:"))
+    game.startup = startup
+    # Attach screen and clock to game for later use, then run it
     game.screen = screen
     game.clock = clock
     game.run()
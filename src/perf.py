@@ -0,0 +1,186 @@
+"""
+Latency instrumentation for The People Person
+"""
+import cProfile
+import functools
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def percentile(values, p: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Histogram:
+    """Running count/total/max plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, window: int = 2048):
+        self.samples: deque = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def percentile(self, p: float) -> float:
+        return percentile(list(self.samples), p)
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class PerfRecorder:
+    """Per-stage latency histograms, prompt sizes and frame times.
+
+    Timings are recorded in seconds under a stage name (an agent name, 'render_ui',
+    'wrap_text', ...). If `trace_path` is set every sample is also appended to a JSONL
+    trace file. `profile_turns=(first, last)` captures a cProfile of the thread that
+    calls `turn()` (the game/render thread) for that window of player turns.
+    """
+
+    def __init__(self, trace_path=None, window: int = 2048, profile_turns=None,
+                 profile_path='turns.prof'):
+        self.window = window
+        self.histograms: dict[str, Histogram] = {}
+        self.profile_turns = profile_turns
+        self.profile_path = profile_path
+        self._profiler = None
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, 'a', buffering=1) if trace_path else None
+
+    def record(self, stage, seconds: float, **attrs):
+        """Add a timing sample (plus any extra attributes for the trace)."""
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram(self.window)
+            hist.add(seconds)
+            if self._trace is not None:
+                entry = {'ts': round(time.time(), 6), 'stage': stage, 'ms': round(seconds * 1000, 3)}
+                entry.update(attrs)
+                self._trace.write(json.dumps(entry) + '\n')
+
+    def record_value(self, name, value: float):
+        """Add a non-timing sample, such as a prompt size in tokens."""
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(self.window)
+            hist.add(value)
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """Time the body of a `with` block as one sample of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(stage, time.perf_counter() - start, **attrs)
+
+    def percentiles(self, stage, ps=(50, 95)) -> tuple:
+        """Percentiles of a stage in seconds (zeros if nothing was recorded)."""
+        hist = self.histograms.get(stage)
+        return tuple(hist.percentile(p) if hist else 0.0 for p in ps)
+
+    def last(self, stage) -> float:
+        hist = self.histograms.get(stage)
+        return hist.last if hist else 0.0
+
+    def summary(self) -> dict:
+        """Summary of every histogram."""
+        with self._lock:
+            return {stage: hist.summary() for stage, hist in sorted(self.histograms.items())}
+
+    def turn(self, index: int):
+        """Mark the start of player turn `index`, starting or stopping the profiler window."""
+        if not self.profile_turns:
+            return
+        first, last = self.profile_turns
+        if index == first and self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif index > last and self._profiler is not None:
+            self.stop_profile()
+
+    def stop_profile(self):
+        """Stop a running profile and write it to `profile_path`."""
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+
+    def close(self):
+        self.stop_profile()
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+# Process-wide recorder used unless a Game is given its own
+RECORDER = PerfRecorder()
+
+
+def configure(**kwargs) -> PerfRecorder:
+    """Replace the process-wide recorder (e.g. to enable tracing or profiling)."""
+    global RECORDER
+    RECORDER.close()
+    RECORDER = PerfRecorder(**kwargs)
+    return RECORDER
+
+
+def timed(stage):
+    """Decorator that records every call of a function under `stage` in the current recorder."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                RECORDER.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class StartupTimer:
+    """Milestones of process startup (first frame, first caller, ...) in seconds since `start`.
+
+    Each milestone is recorded once, as `startup.<name>` in the current recorder.
+    """
+
+    def __init__(self, start: float = None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks: dict[str, float] = {}
+
+    def mark(self, name) -> bool:
+        """Record a milestone now; returns False if it was already recorded."""
+        if name in self.marks:
+            return False
+        self.marks[name] = elapsed = time.perf_counter() - self.start
+        RECORDER.record(f"startup.{name}", elapsed)
+        return True
+
+    def report(self) -> str:
+        return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.marks.items())
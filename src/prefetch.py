@@ -0,0 +1,100 @@
+"""
+Background prefetching of upcoming callers for The People Person
+"""
+import asyncio
+from typing import Awaitable, Callable, NamedTuple, Union
+
+from agent_loop import AgentLoop
+
+
+class PrefetchedCaller(NamedTuple):
+    """A caller that is ready to be put through: personality, opening line and initial score.
+
+    `health` may still be an asyncio future when the caller is handed out, so the
+    opening line can be shown while the initial score is being computed.
+    """
+    personality: str
+    first_text: str
+    health: Union[int, "asyncio.Future[int]"]
+
+
+class CallerPrefetcher:
+    """Build upcoming callers on the agent loop and keep a small bounded queue of them ready.
+
+    Workers stop as soon as the queue is full, so at most `size` callers (plus the ones
+    being built) are ever requested ahead of time. `close()` cancels the workers, which
+    also cancels any agent request they have in flight.
+    """
+
+    def __init__(self, agent_loop: AgentLoop,
+                 build_caller: Callable[[], Awaitable[PrefetchedCaller]],
+                 size: int = 2, workers: int = 1):
+        self._agent_loop = agent_loop
+        self._build_caller = build_caller
+        self._size = max(1, size)
+        self._workers = max(1, min(workers, self._size))
+        self._ready = None
+        self._task = None
+        self._closed = False
+
+    def start(self):
+        """Start the background workers (idempotent)."""
+        if self._task is None and not self._closed:
+            self._task = self._agent_loop.submit(self._fill())
+
+    def get(self, timeout=None) -> PrefetchedCaller:
+        """Return the next ready caller, blocking until one is available."""
+        return self.get_future().result(timeout)
+
+    def get_future(self):
+        """Return a thread-safe future for the next ready caller (RuntimeError once closed)."""
+        if self._closed:
+            raise RuntimeError("caller prefetcher is closed")
+        self.start()
+        return self._agent_loop.submit(self._next())
+
+    def ready_count(self) -> int:
+        """Number of callers currently waiting in the queue."""
+        return self._ready.qsize() if self._ready is not None else 0
+
+    def close(self):
+        """Cancel the pipeline, its in-flight requests and any callers that were never used."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._ready is not None:
+            self._agent_loop.call_soon(self._drain)
+
+    def _queue(self) -> asyncio.Queue:
+        # Created on first use on the agent loop, the loop it belongs to
+        if self._ready is None:
+            self._ready = asyncio.Queue(maxsize=self._size)
+        return self._ready
+
+    async def _next(self) -> PrefetchedCaller:
+        item = await self._queue().get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    async def _fill(self):
+        self._queue()
+        await asyncio.gather(*(self._worker() for _ in range(self._workers)))
+
+    async def _worker(self):
+        while True:
+            try:
+                item = await self._build_caller()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Hand the failure to the consumer rather than dying silently
+                item = exc
+            await self._ready.put(item)
+
+    def _drain(self):
+        while not self._ready.empty():
+            item = self._ready.get_nowait()
+            if isinstance(item, PrefetchedCaller) and isinstance(item.health, asyncio.Future):
+                item.health.cancel()
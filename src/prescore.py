@@ -0,0 +1,129 @@
+"""
+Fast local mental health pre-scorer for The People Person
+"""
+import re
+
+import numpy as np
+
+# Lexicon weights: negative values pull the score down, positive values push it up.
+# Crisis terms are weighted heavily so explicit intent dominates a window.
+LEXICON = {
+    # crisis / intent
+    "suicide": -3.0, "suicidal": -3.0, "kill": -2.5, "die": -2.5, "dying": -2.0,
+    "dead": -2.0, "overdose": -3.0, "pills": -1.5, "jump": -1.5, "goodbye": -2.0,
+    "end": -1.0, "ending": -1.5, "disappear": -2.0, "gone": -1.0,
+    # distress
+    "hopeless": -2.0, "worthless": -2.0, "useless": -1.5, "alone": -1.5, "lonely": -1.5,
+    "empty": -1.5, "numb": -1.5, "trapped": -2.0, "burden": -2.0, "pointless": -2.0,
+    "tired": -1.0, "exhausted": -1.2, "scared": -1.2, "afraid": -1.2, "pain": -1.5,
+    "hurt": -1.2, "hurts": -1.2, "hate": -1.5, "cry": -1.0, "crying": -1.0,
+    "sad": -1.0, "depressed": -1.8, "anxious": -1.0, "panic": -1.2, "failure": -1.5,
+    "nobody": -1.2, "nothing": -0.8, "never": -0.6, "can't": -0.6, "cannot": -0.6,
+    "lost": -1.0, "broken": -1.5, "hopelessness": -2.0, "despair": -2.0,
+    # recovery / coping
+    "better": 1.5, "hope": 1.5, "hopeful": 1.8, "thank": 1.2, "thanks": 1.2,
+    "helps": 1.2, "helped": 1.3, "helpful": 1.2, "okay": 0.8, "ok": 0.6, "calm": 1.2,
+    "calmer": 1.5, "safe": 1.5, "relief": 1.5, "relieved": 1.5, "listen": 0.6,
+    "understand": 0.6, "tomorrow": 1.0, "plan": 0.8, "try": 0.8, "trying": 0.8,
+    "friend": 0.8, "family": 0.6, "therapist": 1.0, "doctor": 0.8, "glad": 1.3,
+    "good": 1.0, "love": 1.0, "grateful": 1.5, "lighter": 1.3, "manage": 1.0,
+    "support": 1.0, "talk": 0.5, "talking": 0.5, "feel": 0.0, "appreciate": 1.3,
+}
+NEGATORS = {"not", "no", "never", "don't", "dont", "isn't", "wasn't", "can't", "won't", "nothing"}
+# How many tokens after a negator are flipped
+NEGATION_SCOPE = 2
+# Weight of each of the last three messages (oldest first) and of non-caller speakers
+POSITION_WEIGHTS = np.array([0.5, 0.75, 1.0])
+COUNSELOR_WEIGHT = 0.25
+# Valence (weighted lexicon sum) that maps to a full swing from neutral to 1 or 10
+VALENCE_SCALE = 6.0
+# Caller words in a window at which confidence reaches ~63% of its maximum; shorter
+# windows say too little for a lexicon to read
+COVERAGE_WORDS = 6.0
+# Words that always go to the assessor when a caller uses them, negated or not
+CRISIS_TERMS = {"suicide", "suicidal", "kill", "die", "dying", "dead", "overdose",
+                "pills", "jump", "goodbye", "disappear"}
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+_VOCAB = list(LEXICON)
+_INDEX = {word: i for i, word in enumerate(_VOCAB)}
+_WEIGHTS = np.array([LEXICON[w] for w in _VOCAB])
+
+
+class LocalScorer:
+    """Lexicon and feature based scorer that runs locally in microseconds.
+
+    Scores a window of up to three (speaker, message) turns on the same 1-10 scale as
+    the MentalHealthAssessor and reports a confidence in [0, 1]. Windows are turned
+    into a (windows, 3, vocabulary) count tensor so a whole batch is scored at once.
+    """
+
+    def __init__(self, caller_speaker: str = "Caller"):
+        self.caller_speaker = caller_speaker
+
+    def score(self, window) -> tuple[int, float]:
+        """Score a single window of (speaker, message) turns; returns (score, confidence)."""
+        scores, confidence = self.score_batch([window])
+        return int(scores[0]), float(confidence[0])
+
+    def score_batch(self, windows) -> tuple[np.ndarray, np.ndarray]:
+        """Score many windows at once; returns integer scores and confidences as arrays."""
+        n = len(windows)
+        counts = np.zeros((n, 3, len(_VOCAB)))
+        speaker_w = np.zeros((n, 3))
+        caller_words = np.zeros(n)
+        crisis = np.zeros(n, dtype=bool)
+        for w, window in enumerate(windows):
+            turns = list(window)[-3:]
+            offset = 3 - len(turns)
+            for p, (speaker, msg) in enumerate(turns, start=offset):
+                caller = speaker == self.caller_speaker
+                speaker_w[w, p] = 1.0 if caller else COUNSELOR_WEIGHT
+                tokens = _TOKEN_RE.findall(msg.lower())
+                if caller:
+                    caller_words[w] += len(tokens)
+                    crisis[w] |= not CRISIS_TERMS.isdisjoint(tokens)
+                flip = 0
+                for token in tokens:
+                    idx = _INDEX.get(token)
+                    if idx is not None:
+                        counts[w, p, idx] += -1.0 if flip else 1.0
+                    flip = NEGATION_SCOPE if token in NEGATORS else max(0, flip - 1)
+        weights = POSITION_WEIGHTS * speaker_w  # (n, 3)
+        per_word = counts * weights[:, :, None]  # (n, 3, vocab)
+        signed = per_word * _WEIGHTS  # (n, 3, vocab)
+        valence = signed.sum(axis=(1, 2))
+        positive = np.clip(signed, 0, None).sum(axis=(1, 2))
+        negative = -np.clip(signed, None, 0).sum(axis=(1, 2))
+        evidence = positive + negative
+        scores = np.clip(np.rint(5.5 + 4.5 * np.tanh(valence / VALENCE_SCALE)), 1, 10).astype(int)
+        # Confidence is about how reliable the reading is, not how extreme the score is:
+        # enough caller text to go on, and lexicon evidence that does not contradict
+        # itself (a window with none reads as neutral). Crisis language is never trusted.
+        agreement = np.divide(np.abs(positive - negative), evidence,
+                              out=np.ones(n), where=evidence > 0)
+        coverage = 1.0 - np.exp(-caller_words / COVERAGE_WORDS)
+        confidence = np.where(crisis, 0.0, coverage * (0.5 + 0.5 * agreement))
+        return scores, confidence
+
+
+class ScoringStats:
+    """Counts how many turns were scored locally versus by the LLM assessor."""
+
+    def __init__(self):
+        self.turns = 0
+        self.local = 0
+
+    def record(self, local: bool):
+        self.turns += 1
+        if local:
+            self.local += 1
+
+    @property
+    def skip_rate(self) -> float:
+        """Fraction of turns that did not need a network round trip."""
+        return self.local / self.turns if self.turns else 0.0
+
+    def __str__(self):
+        return (f"local pre-scorer handled {self.local}/{self.turns} turns "
+                f"({self.skip_rate:.0%} skipped the LLM assessor)")
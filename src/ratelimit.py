@@ -0,0 +1,137 @@
+"""
+Token-bucket rate limiting of LLM requests for The People Person
+"""
+import time
+
+# Seconds to pause after a 429 that carries no Retry-After header
+DEFAULT_RETRY_AFTER = 2.0
+
+
+def retry_after(exc: BaseException):
+    """The Retry-After of a rate-limit error in seconds, or None if it has none."""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """Whether an error is the provider's 429 Too Many Requests."""
+    return getattr(exc, 'status_code', None) == 429 or type(exc).__name__ == 'RateLimitError'
+
+
+def default_limits(backend_name: str, rpm=None, tpm=None) -> tuple:
+    """The (rpm, tpm) a command line tool should use when a limit was not given.
+
+    The game's RATE_LIMIT_RPM / RATE_LIMIT_TPM describe the live API key, so they are
+    the defaults for the 'openai' backend; local backends are not limited (0).
+    """
+    # Imported here: game builds on this module
+    from game import RATE_LIMIT_RPM, RATE_LIMIT_TPM
+    live = backend_name == 'openai'
+    if rpm is None:
+        rpm = RATE_LIMIT_RPM if live else 0
+    if tpm is None:
+        tpm = RATE_LIMIT_TPM if live else 0
+    return rpm, tpm
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` units per second up to `burst_seconds` worth of units."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        self.burst_seconds = burst_seconds
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def set_rate(self, per_minute: float):
+        self._refill()
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * self.burst_seconds)
+        self.level = min(self.level, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now).
+
+        Requests larger than the bucket only wait for it to be full.
+        """
+        self._refill()
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Request-per-minute and token-per-minute budgets for one API key.
+
+    Each request costs one request plus its prompt tokens and `completion_allowance`
+    tokens for the reply. On a 429 the budgets are halved (down to `min_scale` of the
+    configured limits) and requests pause for the server's Retry-After; every
+    successful request then restores `recovery_step` of the limits (AIMD). A limit of
+    0 (or None) is not enforced.
+    """
+
+    def __init__(self, rpm: float, tpm: float, burst_seconds: float = 10.0,
+                 completion_allowance: int = 200, min_scale: float = 0.1,
+                 recovery_step: float = 0.05):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.completion_allowance = completion_allowance
+        self.min_scale = min_scale
+        self.recovery_step = recovery_step
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.throttles = 0
+        self.requests = TokenBucket(rpm, burst_seconds) if rpm else None
+        self.tokens = TokenBucket(tpm, burst_seconds) if tpm else None
+
+    def cost(self, prompt_tokens: int) -> int:
+        return prompt_tokens + self.completion_allowance
+
+    def delay(self, prompt_tokens: int) -> float:
+        """Seconds until a request with this many prompt tokens may be sent."""
+        delay = max(0.0, self.paused_until - time.monotonic())
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(self.cost(prompt_tokens)))
+        return delay
+
+    def take(self, prompt_tokens: int):
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(self.cost(prompt_tokens))
+
+    def _rescale(self, scale: float):
+        self.scale = scale
+        if self.requests is not None:
+            self.requests.set_rate(self.rpm * scale)
+        if self.tokens is not None:
+            self.tokens.set_rate(self.tpm * scale)
+
+    def throttled(self, pause=None):
+        """The provider answered 429: back off multiplicatively and pause."""
+        self.throttles += 1
+        now = time.monotonic()
+        if now >= self.paused_until:
+            # One burst of 429s (calls already in flight) halves the budget only once
+            self._rescale(max(self.min_scale, self.scale / 2))
+        self.paused_until = max(self.paused_until, now + (pause or DEFAULT_RETRY_AFTER))
+
+    def succeeded(self):
+        if self.scale < 1.0:
+            self._rescale(min(1.0, self.scale + self.recovery_step))
+
+    def stats(self) -> dict:
+        return {'scale': round(self.scale, 2), 'throttles': self.throttles}
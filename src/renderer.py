@@ -0,0 +1,64 @@
+"""
+Dirty-rectangle rendering helpers for The People Person
+"""
+import pygame
+
+# How long an idle screen sleeps in pygame.event.wait before re-checking its state
+IDLE_TIMEOUT_MS = 500
+
+
+class DirtyRegions:
+    """Track named screen regions and repaint only the ones whose content changed.
+
+    Each frame the view marks its regions with a rect and a key describing what is
+    drawn there; `take()` returns the rects whose key (or position) changed since the
+    last frame. Switching to a different view, or `invalidate()`, repaints the whole screen.
+    """
+
+    def __init__(self, screen_rect: pygame.Rect):
+        self.screen_rect = pygame.Rect(screen_rect)
+        self.view = None
+        self._regions: dict = {}
+        self._dirty: list[pygame.Rect] = []
+        self._full = True
+
+    def begin(self, view):
+        """Start a frame of `view`; a view change forces a full repaint."""
+        if view != self.view:
+            self.view = view
+            self.invalidate()
+
+    def invalidate(self):
+        """Forget all region state so the next frame repaints the whole screen."""
+        self._regions.clear()
+        self._full = True
+
+    def mark(self, name, rect, key):
+        """Record the current rect and content key of a region, marking it dirty if either changed."""
+        rect = pygame.Rect(rect)
+        previous = self._regions.get(name)
+        if previous is not None and previous[1] == key and previous[0] == rect:
+            return
+        if previous is not None and previous[0] != rect:
+            # The region moved or resized: its old area has to be repainted too
+            self._dirty.append(previous[0])
+        self._dirty.append(rect)
+        self._regions[name] = (rect, key)
+
+    def take(self) -> list[pygame.Rect]:
+        """Return the rects to repaint this frame (clipped to the screen) and reset."""
+        if self._full:
+            rects = [self.screen_rect.copy()]
+        else:
+            rects = [r.clip(self.screen_rect) for r in self._dirty]
+            rects = [r for r in rects if r.width and r.height]
+        self._dirty = []
+        self._full = False
+        return rects
+
+
+def wait_events(timeout_ms: int = IDLE_TIMEOUT_MS) -> list:
+    """Block until at least one event arrives (or the timeout passes) and return all pending events."""
+    event = pygame.event.wait(timeout_ms)
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
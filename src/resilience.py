@@ -0,0 +1,224 @@
+"""
+Retries, circuit breaking and hedged requests for agent calls in The People Person
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from ratelimit import is_rate_limited
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+TRANSIENT_STATUS = {408, 409, 429}
+# Exception class names of the OpenAI SDK's connection errors (matched by name so
+# this module does not have to import the SDK)
+TRANSIENT_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError'}
+
+
+class AgentUnavailable(Exception):
+    """An agent call failed after its retries, or its model's circuit is open."""
+
+
+class CircuitOpen(AgentUnavailable):
+    """A model has failed repeatedly and is not being called until it cools down."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether an error from a backend is worth retrying (network, rate limit, 5xx)."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    status = getattr(exc, 'status_code', None)
+    if isinstance(status, int):
+        return status in TRANSIENT_STATUS or status >= 500
+    return type(exc).__name__ in TRANSIENT_ERROR_NAMES
+
+
+class RetryPolicy(NamedTuple):
+    """How transient failures are retried.
+
+    Up to `attempts` tries in total, sleeping a "full jitter" backoff between them:
+    a uniform random delay up to `base_delay * 2**retry`, capped at `max_delay`.
+    """
+    attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """Stops calling a model after `threshold` consecutive transient failures.
+
+    While open every call fails fast with CircuitOpen. After `cooldown` seconds one
+    trial call is let through (half-open): success closes the circuit, failure opens
+    it for another cooldown.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now (claims the trial call when half-open)."""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self) -> bool:
+        """Count a transient failure; returns True if this opened the circuit."""
+        self.failures += 1
+        reopen = self._trial
+        self._trial = False
+        if reopen or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+
+class CallExecutor:
+    """Runs backend calls with retries, a circuit breaker per model and optional hedging.
+
+    A hedged call starts a second identical request if the first has not answered
+    by the stage's observed p90 latency (taken from the perf recorder once it has
+    `hedge_min_samples` samples), uses whichever answers first and cancels the other.
+    A streamed call is won by the first request to produce a token. Retries, hedges
+    and circuit transitions are counted in `events`.
+    """
+
+    def __init__(self, recorder, policy: RetryPolicy = RetryPolicy(), breaker_threshold: int = 5,
+                 breaker_cooldown: float = 30.0, hedge_percentile: float = 90,
+                 hedge_min_samples: int = 20, hedge_min_delay: float = 0.05):
+        self.recorder = recorder
+        self.policy = policy
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.events: Counter = Counter()
+
+    def breaker(self, model) -> CircuitBreaker:
+        key = str(model)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return breaker
+
+    def hedge_delay(self, stage):
+        """Seconds to wait before hedging `stage`, or None while too few samples exist."""
+        hist = self.recorder.histograms.get(stage)
+        if hist is None or hist.count < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, hist.percentile(self.hedge_percentile))
+
+    async def run(self, stage, model, call, on_delta=None, hedge=False):
+        """Return the text of `call(on_delta)`, retrying transient failures.
+
+        Raises CircuitOpen if `model`'s circuit is open and AgentUnavailable once
+        the retries are used up; other errors propagate unchanged.
+        """
+        breaker = self.breaker(model)
+        for attempt in range(self.policy.attempts):
+            if not breaker.allow():
+                self.events[f"{stage}/circuit_open"] += 1
+                raise CircuitOpen(f"{stage}: circuit for {model} is open")
+            try:
+                delay = self.hedge_delay(stage) if hedge else None
+                if delay is None:
+                    text = await call(on_delta)
+                else:
+                    text = await self._hedged(stage, call, on_delta, delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                # A 429 says nothing about the model's health; the rate limiter backs off instead
+                if not is_rate_limited(exc) and breaker.failure():
+                    self.events[f"{model}/circuit_opened"] += 1
+                    logger.warning("Circuit for %s opened after %d failures", model, breaker.failures)
+                if attempt + 1 == self.policy.attempts:
+                    raise AgentUnavailable(f"{stage}: {exc}") from exc
+                self.events[f"{stage}/retry"] += 1
+                logger.info("Retrying %s on %s after %r", stage, model, exc)
+                await asyncio.sleep(self.policy.backoff(attempt))
+                continue
+            breaker.success()
+            return text
+
+    async def _hedged(self, stage, call, on_delta, delay):
+        winner = None
+        tasks = []
+
+        def relay_for(task_index):
+            def relay(text):
+                nonlocal winner
+                if winner is None:
+                    # First token wins: the other stream is dropped
+                    winner = task_index
+                    for i, task in enumerate(tasks):
+                        if i != task_index:
+                            task.cancel()
+                if winner == task_index:
+                    on_delta(text)
+            return relay
+
+        def start(task_index):
+            tasks.append(asyncio.ensure_future(
+                call(relay_for(task_index) if on_delta is not None else None)
+            ))
+
+        start(0)
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and winner is None:
+                self.events[f"{stage}/hedged"] += 1
+                start(1)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                finished = [task for task in done if not task.cancelled()]
+                for task in finished:
+                    error = error or task.exception()
+                for task in finished:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self.events[f"{stage}/hedge_won"] += 1
+                        return task.result()
+            if error is None:
+                raise asyncio.CancelledError
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Retry/hedge/circuit counts as {"stage/event": count}."""
+        return dict(sorted(self.events.items()))
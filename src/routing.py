@@ -0,0 +1,131 @@
+"""
+Per-agent model routing with latency budgets for The People Person
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from resilience import AgentUnavailable, CircuitOpen
+from scheduler import ADMITTED
+
+
+class Route(NamedTuple):
+    """How an agent's calls are routed.
+
+    `tiers` is a sequence of (model, deadline_seconds) tried in order, normally from the
+    preferred model to faster fallbacks; a deadline of None waits indefinitely. A tier
+    that misses its deadline or is unavailable (failed retries, open circuit) passes the
+    call to the next one. If every tier fails the call returns `default` (a local
+    stand-in response), or raises AgentUnavailable when there is none. For streamed calls the deadline applies to
+    the first token: once text is arriving the call is allowed to finish. A deadline
+    starts when the scheduler admits the call, so waiting for a slot or for rate
+    budget delays a call without pushing it to a worse tier.
+    """
+    tiers: tuple
+    default: Optional[str] = None
+
+
+class Routed(NamedTuple):
+    """The answer to a routed call: its text and the model that gave it (None for the local default)."""
+    text: str
+    model: Optional[str]
+
+    @property
+    def is_default(self) -> bool:
+        return self.model is None
+
+
+class ModelRouter:
+    """Runs agent calls along their Route and records each routing decision.
+
+    Every attempt is recorded in the perf recorder as `route.<agent>` with the model,
+    tier and outcome ('ok', 'timeout', 'error', 'open' or 'default'), and outcomes are counted per
+    (agent, model, outcome) in `decisions` so the tiers can be tuned.
+    """
+
+    def __init__(self, routes: dict, recorder, default_model=None):
+        self.routes = routes
+        self.recorder = recorder
+        self.default_model = default_model
+        self.decisions: Counter = Counter()
+
+    def route_for(self, name, model=None) -> Route:
+        """The configured route for an agent; an explicit model bypasses routing."""
+        if model is not None:
+            return Route(((model, None),))
+        if name not in self.routes:
+            return Route(((self.default_model, None),))
+        return self.routes[name]
+
+    async def run(self, name, route: Route, call, on_delta=None, fallback=None) -> Routed:
+        """Run `call(model, on_delta)` along the route's tiers and return its text and model.
+
+        `fallback()`, if given, supplies the local default instead of `route.default`;
+        a default answer is returned with model None.
+        """
+        for tier, (model, deadline) in enumerate(route.tiers):
+            start = time.perf_counter()
+            try:
+                text = await self._attempt(call, model, deadline, on_delta)
+            except asyncio.TimeoutError:
+                self._decide(name, model, tier, 'timeout', time.perf_counter() - start)
+                continue
+            except CircuitOpen:
+                self._decide(name, model, tier, 'open', time.perf_counter() - start)
+                continue
+            except AgentUnavailable:
+                self._decide(name, model, tier, 'error', time.perf_counter() - start)
+                continue
+            self._decide(name, model, tier, 'ok', time.perf_counter() - start)
+            return Routed(text, model)
+        default = fallback() if fallback is not None else route.default
+        if default is None:
+            raise AgentUnavailable(f"{name}: no model tier answered in time")
+        self._decide(name, None, len(route.tiers), 'default', 0.0)
+        if on_delta is not None:
+            on_delta(default)
+        return Routed(default, None)
+
+    async def _attempt(self, call, model, deadline, on_delta):
+        if deadline is None:
+            return await call(model, on_delta)
+        admitted = asyncio.Event()
+        first_token = asyncio.Event()
+        relay = None
+        if on_delta is not None:
+            # Streamed: only the time to the first token counts against the deadline
+            def relay(text):
+                first_token.set()
+                on_delta(text)
+
+        # The call's task (and any hedge it starts) inherits the admission callback
+        token = ADMITTED.set(admitted.set)
+        try:
+            task = asyncio.ensure_future(call(model, relay))
+        finally:
+            ADMITTED.reset(token)
+        admission = asyncio.ensure_future(admitted.wait())
+        first = asyncio.ensure_future(first_token.wait())
+        try:
+            await asyncio.wait({task, admission}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                await asyncio.wait({task, first}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            admission.cancel()
+            first.cancel()
+        if not task.done() and not first_token.is_set():
+            task.cancel()
+            raise asyncio.TimeoutError
+        return await task
+
+    def _decide(self, name, model, tier, outcome, seconds):
+        self.decisions[(name, str(model), outcome)] += 1
+        self.recorder.record(f"route.{name}", seconds, model=str(model), tier=tier, outcome=outcome)
+
+    def stats(self) -> dict:
+        """Routing outcomes as {"agent/model/outcome": count}."""
+        return {"/".join(key): count for key, count in sorted(self.decisions.items())}
@@ -0,0 +1,198 @@
+"""
+Fair, priority-aware, rate-limited scheduling of agent calls
+"""
+import asyncio
+import contextvars
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from ratelimit import RateLimiter, is_rate_limited, retry_after
+
+# Priority classes, most urgent first
+INTERACTIVE = 0
+SCORING = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', SCORING: 'scoring', BACKGROUND: 'background'}
+
+# Session the current task works for (set once per connection by the server)
+SESSION = contextvars.ContextVar('session', default=None)
+# Priority override for the current task and the tasks it spawns (e.g. caller prefetch)
+PRIORITY = contextvars.ContextVar('priority', default=None)
+# Called when the current task's call is admitted (starts its routing deadline)
+ADMITTED = contextvars.ContextVar('admitted', default=None)
+
+
+class FairScheduler:
+    """Admission control for agent calls: concurrency cap, rate limits and priorities.
+
+    A call holds a slot for as long as it talks to the backend:
+
+        async with scheduler.slot(name, prompt_tokens):
+            text = await backend.run(...)
+
+    At most `concurrency` calls hold a slot at once, and with a `limiter` a call is
+    only admitted once the request and token budgets allow it. Waiting calls are
+    admitted strictly by priority class and, within a class, round-robin across
+    sessions, so neither background work nor one busy session can starve a player
+    waiting on a reply. A call's class is the PRIORITY context variable if set,
+    otherwise `priorities[agent name]`, otherwise `default_priority`.
+
+    Queue depth on arrival and queue wait are recorded per class in the perf recorder
+    as `queue_depth.<class>` and `queue.<class>`. A 429 from the backend makes the
+    limiter back off. On admission the ADMITTED callback, if set, is called, so a
+    caller's latency budget can exclude the time spent queueing.
+    """
+
+    def __init__(self, concurrency: int = 32, limiter: RateLimiter = None, priorities=None,
+                 default_priority: int = BACKGROUND, recorder=None):
+        self.concurrency = concurrency
+        self.limiter = limiter
+        self.priorities = priorities or {}
+        self.default_priority = default_priority
+        self.recorder = recorder
+        self.active = 0
+        self.admitted: Counter = Counter()
+        # priority -> session -> waiting (future, prompt_tokens); sessions rotate for round-robin
+        self._queues: dict[int, OrderedDict] = {}
+        self._timer = None
+
+    def priority_of(self, name) -> int:
+        priority = PRIORITY.get()
+        if priority is None:
+            priority = self.priorities.get(name, self.default_priority)
+        return priority
+
+    def queued(self) -> dict:
+        """Number of waiting calls per priority class name."""
+        return {
+            PRIORITY_NAMES.get(p, str(p)): sum(len(waiters) for waiters in sessions.values())
+            for p, sessions in sorted(self._queues.items())
+        }
+
+    @asynccontextmanager
+    async def slot(self, name, prompt_tokens: int = 0):
+        """Wait for admission, then hold a slot for the body of the `async with`."""
+        priority = self.priority_of(name)
+        label = PRIORITY_NAMES.get(priority, str(priority))
+        start = time.perf_counter()
+        await self._acquire(priority, SESSION.get(), prompt_tokens, label)
+        self.admitted[label] += 1
+        on_admitted = ADMITTED.get()
+        if on_admitted is not None:
+            on_admitted()
+        if self.recorder is not None:
+            self.recorder.record(f"queue.{label}", time.perf_counter() - start)
+        try:
+            yield
+        except Exception as exc:
+            if self.limiter is not None and is_rate_limited(exc):
+                self.limiter.throttled(retry_after(exc))
+            raise
+        else:
+            if self.limiter is not None:
+                self.limiter.succeeded()
+        finally:
+            self._release()
+
+    def _admissible(self, prompt_tokens) -> float:
+        """0 if a call can be admitted now, else seconds until the rate limits allow it."""
+        return self.limiter.delay(prompt_tokens) if self.limiter is not None else 0.0
+
+    def _admit(self, prompt_tokens):
+        self.active += 1
+        if self.limiter is not None:
+            self.limiter.take(prompt_tokens)
+
+    async def _acquire(self, priority, session, prompt_tokens, label):
+        if self.active < self.concurrency and not any(self._queues.values()) \
+                and self._admissible(prompt_tokens) == 0:
+            self._admit(prompt_tokens)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        sessions = self._queues.setdefault(priority, OrderedDict())
+        sessions.setdefault(session, deque()).append((waiter, prompt_tokens))
+        if self.recorder is not None:
+            self.recorder.record_value(f"queue_depth.{label}", self.queued()[label])
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we were cancelled: pass it on
+                self._release()
+            else:
+                self._discard(priority, session, waiter)
+            raise
+
+    def _discard(self, priority, session, waiter):
+        sessions = self._queues.get(priority)
+        waiters = sessions.get(session) if sessions else None
+        if waiters is not None:
+            for entry in waiters:
+                if entry[0] is waiter:
+                    waiters.remove(entry)
+                    break
+            if not waiters:
+                del sessions[session]
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admit waiting calls while there are free slots and rate budget."""
+        while self.active < self.concurrency:
+            head = self._head()
+            if head is None:
+                return
+            sessions, session, (waiter, prompt_tokens) = head
+            if waiter.done():
+                self._pop(sessions, session)
+                continue
+            delay = self._admissible(prompt_tokens)
+            if delay > 0:
+                # The most urgent call waits for budget; nothing overtakes it
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                return
+            self._pop(sessions, session)
+            self._admit(prompt_tokens)
+            waiter.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _head(self):
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if sessions:
+                session, waiters = next(iter(sessions.items()))
+                return sessions, session, waiters[0]
+        return None
+
+    @staticmethod
+    def _pop(sessions, session):
+        waiters = sessions[session]
+        waiters.popleft()
+        if waiters:
+            sessions.move_to_end(session)
+        else:
+            del sessions[session]
+
+    def stats(self) -> dict:
+        """Admissions, current queue depth, queue-wait p95 per class and limiter state."""
+        report = {
+            'in_flight': self.active,
+            'admitted': dict(self.admitted),
+            'queued': self.queued(),
+        }
+        if self.recorder is not None:
+            report['wait_p95_ms'] = {
+                label: round(self.recorder.percentiles(f"queue.{label}", (95,))[0] * 1000, 1)
+                for label in self.admitted
+            }
+        if self.limiter is not None:
+            report['rate_limit'] = self.limiter.stats()
+        return report
@@ -0,0 +1,356 @@
+"""
+Multi-session server mode for The People Person.
+
+Hosts many player sessions on one asyncio loop. All sessions share one agent
+backend (and its HTTP connection pool), the response cache, model routing, retry
+state and the high score database. Agent calls go through a fair scheduler that
+serves interactive turns ahead of background work such as caller prefetch and
+conversation summaries.
+
+Clients speak JSON lines over TCP, one object per line:
+
+    -> {"op": "hello", "player": "Sam"}
+    <- {"event": "session", "id": 1, "best": 4}
+    <- {"event": "caller", "text": "Hello? ..."}
+    <- {"event": "health", "health": 5, "delta": 0}
+    <- {"event": "ready"}
+    -> {"op": "say", "text": "I'm here to listen."}
+    <- {"event": "delta", "text": "I guess"}            (streamed, if enabled)
+    <- {"event": "reply", "text": "I guess. It's just..."}
+    <- {"event": "health", "health": 6, "delta": 1}
+    <- {"event": "call_end", "outcome": "saved", "score": 1}   (then the next caller)
+    <- {"event": "ready"}                               (waiting for the counselor)
+    -> {"op": "stats"}
+    <- {"event": "stats", ...}
+    -> {"op": "quit"}
+    <- {"event": "bye", "score": 1, "best": 4, "leaderboard": [["Sam", 4], ...]}
+
+    python src/server.py --port 8765
+    python src/server.py --bench 200 --backend stub
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import itertools
+import tracemalloc
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from backends import AgentsBackend, Backend, StubBackend
+from cache import ResponseCache
+from game import (
+    AGENT_PRIORITIES, AGENT_ROUTES, DEFAULT_MODEL, RATE_LIMIT_RPM, RATE_LIMIT_TPM,
+    RESPONSE_CACHE_FILE, UNCACHED_AGENTS, Game, call_outcome,
+)
+from high_scores import HighScoreStore
+from perf import percentile
+from ratelimit import RateLimiter, default_limits
+from resilience import CallExecutor
+from routing import ModelRouter
+from scheduler import SESSION, FairScheduler
+import perf
+
+# Agent calls in flight at once across all sessions
+SERVER_CONCURRENCY = 32
+# Longest accepted protocol line (bytes)
+MAX_LINE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class HostedSession:
+    """One player's session on the server: a Game plus the state of the current call."""
+
+    def __init__(self, session_id: int, game: Game, writer: asyncio.StreamWriter, stream: bool):
+        self.id = session_id
+        self.game = game
+        self.writer = writer
+        self.stream = stream
+        self.caller = None
+        self.chat_history = None
+        self.health = 5
+        self._next_caller = None
+
+    def send(self, **message):
+        self.writer.write(json.dumps(message).encode('utf-8') + b'\n')
+
+    def _prefetch(self):
+        self._next_caller = asyncio.ensure_future(self.game.build_caller())
+
+    async def put_through(self):
+        """Connect the next caller, skipping callers whose first score already ends the call."""
+        while True:
+            if self._next_caller is None:
+                self._prefetch()
+            caller = await self._next_caller
+            self._prefetch()
+            self.caller = caller
+            self.chat_history = self.game.new_context(caller.first_text)
+            self.send(event='caller', text=caller.first_text)
+            health = caller.health
+            if isinstance(health, asyncio.Future):
+                health = await health
+            if not self.set_health(health):
+                self.send(event='ready')
+                return
+
+    def set_health(self, health: int) -> bool:
+        """Report a new score; returns True (and scores the call) if the call ended."""
+        self.send(event='health', health=health, delta=health - self.health)
+        self.health = health
+        outcome = call_outcome(health)
+        if outcome is None:
+            return False
+        self.game.score += 1 if outcome == 'saved' else -1
+        self.send(event='call_end', outcome=outcome, score=self.game.score)
+        self.health = 5
+        return True
+
+    async def say(self, text: str):
+        """Play one counselor turn: the caller's reply, then its score."""
+        on_delta = (lambda partial: self.send(event='delta', text=partial)) if self.stream else None
+        reply = await self.game.get_caller_response(
+            text, self.caller.personality, self.chat_history, on_delta=on_delta
+        )
+        self.chat_history.append(("You", text))
+        self.chat_history.append(("Caller", reply))
+        self.send(event='reply', text=reply)
+        await self.writer.drain()
+        if self.set_health(await self.game.score_mental_health(self.chat_history)):
+            await self.put_through()
+        else:
+            self.send(event='ready')
+
+    def close(self):
+        """Cancel background work and persist the player's score."""
+        if self._next_caller is not None:
+            self._next_caller.cancel()
+            if self._next_caller.done() and not self._next_caller.cancelled() \
+                    and self._next_caller.exception() is None:
+                health = self._next_caller.result().health
+                if isinstance(health, asyncio.Future):
+                    health.cancel()
+        self.game.save_high_scores()
+
+
+class GameServer:
+    """Hosts sessions for many players, sharing one backend and its caches."""
+
+    def __init__(self, backend: Backend, concurrency: int = SERVER_CONCURRENCY,
+                 high_scores_db=Game.HIGH_SCORES_DB, stream: bool = True, recorder=None,
+                 rpm: float = RATE_LIMIT_RPM, tpm: float = RATE_LIMIT_TPM):
+        self.recorder = recorder or perf.RECORDER
+        self.backend = backend
+        # One scheduler and rate limiter for every session: they share the API key's limits
+        self.scheduler = FairScheduler(
+            concurrency, RateLimiter(rpm, tpm) if rpm or tpm else None,
+            priorities=AGENT_PRIORITIES, recorder=self.recorder,
+        )
+        self.response_cache = ResponseCache(path=RESPONSE_CACHE_FILE, bypass=UNCACHED_AGENTS)
+        self.router = ModelRouter(AGENT_ROUTES, self.recorder, default_model=DEFAULT_MODEL)
+        self.executor = CallExecutor(self.recorder)
+        self.high_scores = HighScoreStore(high_scores_db)
+        self.stream = stream
+        self.sessions: dict[int, HostedSession] = {}
+        self._ids = itertools.count(1)
+        self._baseline = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+    def new_game(self, player_name) -> Game:
+        return Game(
+            "", player_name, response_cache=self.response_cache, backend=self.backend,
+            recorder=self.recorder, router=self.router, executor=self.executor,
+            high_scores=self.high_scores, scheduler=self.scheduler,
+        )
+
+    def stats(self) -> dict:
+        """Sessions, scheduler state and (with tracemalloc on) memory per session."""
+        report = {
+            'sessions': len(self.sessions),
+            'scheduler': self.scheduler.stats(),
+            'cache': self.response_cache.stats(),
+        }
+        if self._baseline is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            report['memory_kb'] = round(current / 1024, 1)
+            report['peak_memory_kb'] = round(peak / 1024, 1)
+            if self.sessions:
+                report['kb_per_session'] = round((current - self._baseline) / 1024 / len(self.sessions), 1)
+        return report
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one client connection (one session) until it quits or disconnects."""
+        session = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request['op']
+                except (ValueError, KeyError, TypeError):
+                    writer.write(b'{"event": "error", "message": "bad request"}\n')
+                    continue
+                if op == 'stats':
+                    writer.write(json.dumps({'event': 'stats', **self.stats()}).encode('utf-8') + b'\n')
+                elif op == 'hello' and session is None:
+                    session = self.open_session(request.get('player') or 'Player', writer)
+                    await session.put_through()
+                elif op == 'say' and session is not None and request.get('text'):
+                    await session.say(str(request['text']))
+                elif op == 'quit':
+                    break
+                else:
+                    writer.write(b'{"event": "error", "message": "unexpected request"}\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if session is not None:
+                self.close_session(session)
+                if not writer.is_closing():
+                    session.send(event='bye', score=session.game.score,
+                                 best=max(session.game.player_best_score, session.game.score),
+                                 leaderboard=self.high_scores.top(10))
+            writer.close()
+
+    def open_session(self, player_name, writer) -> HostedSession:
+        session = HostedSession(next(self._ids), self.new_game(player_name), writer, self.stream)
+        # Every agent call made on behalf of this connection is scheduled as this session
+        SESSION.set(session.id)
+        self.sessions[session.id] = session
+        session.send(event='session', id=session.id, best=session.game.player_best_score)
+        return session
+
+    def close_session(self, session: HostedSession):
+        session.close()
+        self.sessions.pop(session.id, None)
+
+    async def serve(self, host='127.0.0.1', port=8765, report_interval: float = 60.0):
+        # Load the SDK and connect before the first player arrives
+        await self.backend.warm_up()
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+        logger.info("Serving on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+        async with server:
+            while True:
+                await asyncio.sleep(report_interval)
+                logger.info("Server: %s", self.stats())
+
+    def close(self):
+        for session in list(self.sessions.values()):
+            self.close_session(session)
+        logger.info("Model routing: %s", self.router.stats())
+        logger.info("Retries and hedging: %s", self.executor.stats())
+        self.response_cache.close()
+        self.high_scores.close()
+
+
+async def bench_client(host, port, index: int, turns: int, latencies: list):
+    """A scripted client: say hello, play `turns` turns, then quit."""
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+
+    async def until(*events):
+        while True:
+            message = json.loads(await reader.readline())
+            if message['event'] in events:
+                return message
+
+    writer.write(json.dumps({'op': 'hello', 'player': f"bench-{index}"}).encode() + b'\n')
+    await until('ready')
+    for turn in range(turns):
+        start = time.perf_counter()
+        writer.write(json.dumps({'op': 'say', 'text': f"I'm listening ({turn})."}).encode() + b'\n')
+        await until('reply')
+        latencies.append(time.perf_counter() - start)
+        await until('ready')
+    writer.write(b'{"op": "quit"}\n')
+    await until('bye')
+    writer.close()
+
+
+async def bench(server: GameServer, clients: int, turns: int) -> dict:
+    """Run `clients` concurrent scripted sessions against an in-process server."""
+    listener = await asyncio.start_server(server.handle, '127.0.0.1', 0, limit=MAX_LINE)
+    port = listener.sockets[0].getsockname()[1]
+    latencies: list[float] = []
+    peak = {}
+
+    async def sample():
+        while True:
+            await asyncio.sleep(0.5)
+            stats = server.stats()
+            if stats['sessions'] >= peak.get('sessions', 0):
+                peak.update(stats)
+
+    sampler = asyncio.ensure_future(sample())
+    start = time.perf_counter()
+    async with listener:
+        await asyncio.gather(*(bench_client('127.0.0.1', port, i, turns, latencies) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    return {
+        'clients': clients,
+        'elapsed_s': round(elapsed, 3),
+        'turns_per_second': round(len(latencies) / elapsed, 2),
+        'reply_p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'reply_p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'reply_p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'scheduler': server.scheduler.stats(),
+        'at_peak': peak,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-session server for The People Person")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=SERVER_CONCURRENCY,
+                        help="agent calls in flight at once across all sessions")
+    parser.add_argument('--rpm', type=float,
+                        help="requests per minute allowed (default: the game's for openai, none for stub; 0: none)")
+    parser.add_argument('--tpm', type=float,
+                        help="tokens per minute allowed (default: the game's for openai, none for stub; 0: none)")
+    parser.add_argument('--backend', choices=['stub', 'openai'], default='openai')
+    parser.add_argument('--latency', type=float, default=0.5, help="stub latency per call (s)")
+    parser.add_argument('--no-stream', action='store_true', help="send caller replies only when complete")
+    parser.add_argument('--trace-memory', action='store_true', help="report memory per session (tracemalloc)")
+    parser.add_argument('--report-interval', type=float, default=60.0, help="seconds between stats log lines")
+    parser.add_argument('--bench', type=int, metavar='CLIENTS',
+                        help="run this many scripted clients in-process and print a report")
+    parser.add_argument('--bench-turns', type=int, default=5)
+    parser.add_argument('--api-key', default=os.environ.get('OPENAI_API_KEY'))
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.backend == 'stub':
+        backend = StubBackend(latency=args.latency)
+    else:
+        if not args.api_key:
+            parser.error("--backend openai needs --api-key or OPENAI_API_KEY")
+        backend = AgentsBackend(args.api_key)
+    args.rpm, args.tpm = default_limits(args.backend, args.rpm, args.tpm)
+    if args.trace_memory or args.bench:
+        tracemalloc.start()
+    if args.bench:
+        server = GameServer(backend, args.concurrency, high_scores_db=':memory:', stream=not args.no_stream,
+                            rpm=args.rpm, tpm=args.tpm)
+        report = asyncio.run(bench(server, args.bench, args.bench_turns))
+        server.close()
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    server = GameServer(backend, args.concurrency, stream=not args.no_stream, rpm=args.rpm, tpm=args.tpm)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Switchboard mode for The People Person: several callers on the line at once
+"""
+import logging
+import time
+
+import pygame
+
+from game import STREAM_REPLIES, Game, call_outcome
+from prefetch import CallerPrefetcher
+from scheduler import SESSION
+
+# Lines on the switchboard unless configured otherwise
+DEFAULT_LINES = 3
+# Seconds a finished call stays on its line before the next caller is put through
+CALL_END_PAUSE = 2.0
+# Line states (what the line is waiting for)
+RINGING = 'ringing'    # the next caller is being put through
+COUNSELOR = 'counselor'  # the counselor's message
+REPLY = 'reply'        # the caller's reply
+SCORING = 'scoring'    # the caller's new score
+ENDED = 'ended'        # the call just ended
+
+logger = logging.getLogger(__name__)
+
+
+class Line:
+    """One conversation on the switchboard.
+
+    The render loop reads every line each frame, so lines use __slots__ and keep
+    only the live state: the bounded conversation
+    context, the two messages on screen, the draft being typed and the request in
+    flight (a concurrent future) together with the state it belongs to.
+    """
+    __slots__ = ('number', 'state', 'pending', 'personality', 'history', 'health',
+                 'caller_text', 'player_text', 'draft', 'unread', 'outcome', 'ended_at', 'reply_id')
+
+    def __init__(self, number: int):
+        self.number = number
+        self.state = RINGING
+        self.pending = None
+        self.personality = None
+        self.history = None
+        self.health = 5
+        self.caller_text = ''
+        self.player_text = ''
+        self.draft = ''
+        self.unread = False
+        self.outcome = None
+        self.ended_at = 0.0
+        self.reply_id = 0
+
+
+async def _on_line(number: int, awaitable):
+    # Agent calls made for this line are scheduled as their own session, so the
+    # scheduler round-robins between lines instead of serving them first come first served
+    SESSION.set(number)
+    return await awaitable
+
+
+class Switchboard(Game):
+    """Game mode with several concurrent callers, shown as tabs in the header.
+
+    Every line has its own caller, conversation and health. Replies and scoring for
+    all lines run concurrently on the agent loop while one render loop polls them, so
+    answering one line never waits on another line's request. Tab / Shift+Tab (or a
+    click on a tab, or Alt+number) switches lines; each line keeps its own draft.
+    """
+
+    def __init__(self, *args, lines: int = DEFAULT_LINES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lines = [Line(number) for number in range(1, lines + 1)]
+        self.active = 0
+        self.calls_handled = 0
+        # Keep a caller ready for every line, built in parallel so no line rings after the others
+        self.prefetcher = CallerPrefetcher(self.agent_loop, self.build_caller, size=lines, workers=lines)
+
+    def setup_screen(self):
+        super().setup_screen()
+        w = self.screen.get_width()
+        # Tabs sit in the header between the health label and the Quit button
+        left, right = 440, w - 110
+        width = min(80, (right - left) // len(self.lines))
+        self.tab_rects = [
+            pygame.Rect(left + i * width, 15, width - 6, 30) for i in range(len(self.lines))
+        ]
+        self.tabs_rect = pygame.Rect(left, 15, right - left, 30)
+
+    def run(self):
+        """Switchboard loop: poll every line, render the active one and handle input."""
+        self.setup_screen()
+        self.prefetcher.start()
+        for line in self.lines:
+            self.ring(line)
+        self.show_line(self.lines[self.active])
+        while True:
+            now = time.monotonic()
+            for line in self.lines:
+                self.poll(line, now)
+            active = self.lines[self.active]
+            self.show_line(active)
+            pygame.display.update(self.render_ui(self.input_text))
+            busy = any(line.state != COUNSELOR for line in self.lines)
+            for event in self.next_events(busy=busy):
+                action = self.handle_event(event)
+                if action == 'quit':
+                    self.end_session()
+                    self.show_leaderboard()
+                elif action == 'submit':
+                    self.submit(self.lines[self.active])
+                elif action == 'cancel':
+                    self.cancel(self.lines[self.active])
+
+    def ring(self, line: Line):
+        """Put the next prefetched caller through to a line."""
+        line.state = RINGING
+        line.outcome = None
+        line.pending = self.prefetcher.get_future()
+
+    def poll(self, line: Line, now: float):
+        """Advance a line whose request has finished (or whose ended call has timed out)."""
+        if line.state == ENDED:
+            if now - line.ended_at >= CALL_END_PAUSE:
+                self.ring(line)
+            return
+        if line.pending is None or not line.pending.done():
+            return
+        future, line.pending = line.pending, None
+        try:
+            result = future.result()
+        except Exception as exc:
+            logger.warning("Line %d: %s request failed: %r", line.number, line.state, exc)
+            self.recover(line)
+            return
+        if line.state == RINGING:
+            line.personality, first_text, health = result
+            if self.startup is not None and self.startup.mark('first_caller'):
+                logger.info("Startup: %s", self.startup.report())
+            line.history = self.new_context(first_text)
+            line.caller_text = first_text
+            line.player_text = ''
+            line.health = 5
+            line.unread = line.number - 1 != self.active
+            self.start(line, SCORING, self.agent_loop.submit(health))
+        elif line.state == REPLY:
+            line.caller_text = result
+            line.history.append(("You", line.player_text))
+            line.history.append(("Caller", result))
+            self.start(line, SCORING, self.agent_loop.submit(
+                _on_line(line.number, self.score_mental_health(line.history))
+            ))
+        elif line.state == SCORING:
+            self.scored(line, result)
+
+    def start(self, line: Line, state: str, future):
+        line.state = state
+        line.pending = future
+
+    def scored(self, line: Line, health: int):
+        """Apply a line's new score and end its call at the thresholds."""
+        if line.number - 1 == self.active:
+            self.add_notification(health - line.health)
+        else:
+            line.unread = True
+        line.health = health
+        line.state = COUNSELOR
+        outcome = call_outcome(health)
+        if outcome is None:
+            return
+        self.score += 1 if outcome == 'saved' else -1
+        self.calls_handled += 1
+        line.outcome = outcome
+        line.state = ENDED
+        line.ended_at = time.monotonic()
+
+    def recover(self, line: Line):
+        """Put a line back in a usable state after a failed request."""
+        if line.state == RINGING:
+            self.ring(line)
+        elif line.state == REPLY:
+            self.restore_draft(line)
+        else:
+            line.state = COUNSELOR
+
+    def submit(self, line: Line):
+        """Send the draft to the line's caller (kept as a draft while the line is busy)."""
+        text = self.input_text
+        if line.state != COUNSELOR or not text.strip():
+            return
+        self.input_text = ''
+        self.turn_index += 1
+        self.perf.turn(self.turn_index)
+        line.player_text = text
+        line.caller_text = "Thinking..."
+        on_delta = self.line_partial_reply_handler(line) if STREAM_REPLIES else None
+        self.start(line, REPLY, self.agent_loop.submit(_on_line(
+            line.number,
+            self.get_caller_response(text, line.personality, line.history, on_delta=on_delta),
+        )))
+
+    def cancel(self, line: Line):
+        """Escape: take back a message whose reply is still coming."""
+        if line.state == REPLY and line.pending is not None:
+            line.pending.cancel()
+            line.pending = None
+            self.restore_draft(line)
+
+    def line_partial_reply_handler(self, line: Line):
+        """Streaming callback for a line's new caller reply, silenced once the reply is taken back."""
+        with self._reply_lock:
+            line.reply_id += 1
+            reply_id = line.reply_id
+
+        def show(text):
+            with self._reply_lock:
+                if text and line.reply_id == reply_id:
+                    line.caller_text = text
+        return show
+
+    def restore_draft(self, line: Line):
+        """Put an unanswered message back into its line's draft."""
+        with self._reply_lock:
+            # A delta of the cancelled reply may still be running on the agent loop
+            line.reply_id += 1
+        sent = line.player_text
+        # The unanswered message was not added to the history: show the last exchange again
+        line.caller_text = line.history[-1][1]
+        line.player_text = line.history[-2][1] if len(line.history) > 1 else ''
+        line.state = COUNSELOR
+        if line.number - 1 == self.active:
+            self.input_text = sent + ('\n' + self.input_text if self.input_text else '')
+        else:
+            # A background line's draft is swapped into the input box when it is switched to
+            line.draft = sent + ('\n' + line.draft if line.draft else '')
+            line.unread = True
+
+    def switch_to(self, index: int):
+        """Make another line the active one, keeping each line's draft."""
+        if index == self.active:
+            return
+        self.lines[self.active].draft = self.input_text
+        self.active = index
+        line = self.lines[index]
+        self.input_text, line.draft = line.draft, ''
+        line.unread = False
+        # Health notifications belong to the line they were shown on
+        self.notifications.clear()
+
+    def show_line(self, line: Line):
+        """Point the call screen at the active line."""
+        if line.state == RINGING:
+            self.last_caller_text = "Ringing..."
+            self.last_player_text = ''
+        elif line.state == ENDED:
+            self.last_caller_text = f"{line.caller_text}  [Call ended: caller {line.outcome}]"
+            self.last_player_text = line.player_text
+        else:
+            self.last_caller_text = line.caller_text
+            self.last_player_text = line.player_text
+        self.current_health_score = line.health
+        self.prev_health_score = line.health
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            mods = pygame.key.get_mods()
+            if event.key == pygame.K_TAB:
+                step = -1 if mods & pygame.KMOD_SHIFT else 1
+                self.switch_to((self.active + step) % len(self.lines))
+                return None
+            if mods & pygame.KMOD_ALT and pygame.K_1 <= event.key < pygame.K_1 + len(self.lines):
+                self.switch_to(event.key - pygame.K_1)
+                return None
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            for index, rect in enumerate(self.tab_rects):
+                if rect.collidepoint(event.pos):
+                    self.switch_to(index)
+                    return None
+        return super().handle_event(event)
+
+    def tab_state(self):
+        return (self.active,) + tuple(
+            (line.state, line.health, line.unread, line.outcome) for line in self.lines
+        )
+
+    def mark_regions(self, input_text):
+        super().mark_regions(input_text)
+        self.dirty.mark('tabs', self.tabs_rect, self.tab_state())
+
+    def paint_ui(self, input_text):
+        super().paint_ui(input_text)
+        self.paint_tabs()
+
+    def paint_tabs(self):
+        """One tab per line: number and health, colored by what the line is doing."""
+        for index, (line, rect) in enumerate(zip(self.lines, self.tab_rects)):
+            if line.state == ENDED:
+                color = (40, 140, 60) if line.outcome == 'saved' else (160, 40, 40)
+            elif index == self.active:
+                color = (90, 90, 150)
+            elif line.unread:
+                color = (150, 120, 30)
+            else:
+                color = (70, 70, 90)
+            pygame.draw.rect(self.screen, color, rect)
+            if index == self.active:
+                pygame.draw.rect(self.screen, (255, 255, 255), rect, 2)
+            status = "..." if line.state in (RINGING, REPLY, SCORING) else str(line.health)
+            label = self.layout_cache.render_line(f"{line.number}: {status}", self.font_small, (255, 255, 255))
+            self.screen.blit(label, label.get_rect(center=rect.center))
+
+    def end_session(self):
+        for line in self.lines:
+            if line.pending is not None:
+                line.pending.cancel()
+        logger.info("Switchboard: %d calls finished on %d lines", self.calls_handled, len(self.lines))
+        super().end_session()
@@ -0,0 +1,110 @@
+"""
+Text wrapping and cached text layout for The People Person
+"""
+from collections import OrderedDict
+
+import pygame
+
+from perf import timed
+
+
+@timed('wrap_text')
+def wrap_text(text: str, font: pygame.font.Font, max_width: int) -> list[str]:
+    """Wrap text into lines that fit within max_width using the given font."""
+    words = text.split(' ')
+    lines: list[str] = []
+    current = ''
+    for word in words:
+        test = (current + ' ' + word).strip()
+        if font.size(test)[0] <= max_width:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    return lines
+
+
+class IncrementalWrapper:
+    """Wrap text that grows at the end (e.g. a streamed reply), rewrapping only the tail.
+
+    Greedy wrapping never changes earlier lines when text is appended, so only the
+    last wrapped line plus the new suffix has to be measured again.
+    """
+
+    def __init__(self, font: pygame.font.Font, max_width: int):
+        self.font = font
+        self.max_width = max_width
+        self.text = ''
+        self.lines: list[str] = []
+
+    def wrap(self, text: str) -> list[str]:
+        """Return the wrapped lines for text, reusing the previous result where possible."""
+        if text == self.text:
+            return self.lines
+        if self.lines and text.startswith(self.text):
+            suffix = text[len(self.text):]
+            if self.text.endswith(' '):
+                suffix = ' ' + suffix
+            self.lines = self.lines[:-1] + wrap_text(
+                self.lines[-1] + suffix, self.font, self.max_width
+            )
+        else:
+            self.lines = wrap_text(text, self.font, self.max_width)
+        self.text = text
+        return self.lines
+
+
+class LayoutCache:
+    """LRU caches for wrapped text and pre-rendered line surfaces.
+
+    Layouts are keyed by (text, font, width) and line surfaces by (line, font, color),
+    so a frame in which nothing changed does no measuring or rendering at all.
+    """
+
+    def __init__(self, max_layouts: int = 256, max_surfaces: int = 1024):
+        self.max_layouts = max_layouts
+        self.max_surfaces = max_surfaces
+        self._layouts: OrderedDict = OrderedDict()
+        self._surfaces: OrderedDict = OrderedDict()
+
+    def wrap(self, text: str, font: pygame.font.Font, max_width: int) -> list[str]:
+        """Cached `wrap_text`."""
+        key = (text, font, max_width)
+        lines = self._layouts.get(key)
+        if lines is None:
+            lines = wrap_text(text, font, max_width)
+            self._layouts[key] = lines
+            if len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+        else:
+            self._layouts.move_to_end(key)
+        return lines
+
+    def render_line(self, line: str, font: pygame.font.Font, color) -> pygame.Surface:
+        """Cached `font.render` for a single antialiased line."""
+        key = (line, font, tuple(color))
+        surf = self._surfaces.get(key)
+        if surf is None:
+            surf = font.render(line, True, color)
+            self._surfaces[key] = surf
+            if len(self._surfaces) > self.max_surfaces:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surf
+
+    def render_lines(self, lines, font: pygame.font.Font, color) -> list[pygame.Surface]:
+        """Render (or fetch) a surface for every line."""
+        return [self.render_line(line, font, color) for line in lines]
+
+    def layout(self, text: str, font: pygame.font.Font, max_width: int, color) -> list[pygame.Surface]:
+        """Wrap text and return the line surfaces, both served from cache when possible."""
+        return self.render_lines(self.wrap(text, font, max_width), font, color)
+
+    def clear(self):
+        """Drop all cached layouts and surfaces."""
+        self._layouts.clear()
+        self._surfaces.clear()